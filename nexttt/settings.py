@@ -39,12 +39,14 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     "django_ckeditor_5",
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -80,6 +82,32 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock when a transaction starts, not at its first write:
+        # SQLite has no SELECT ... FOR UPDATE, so this is what serialises the
+        # check-then-insert in book_model, and it avoids "database is locked"
+        # errors when a read transaction later needs to write.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+
+# Cache
+# In-process LRU in front of a SQLite file shared by all workers on the host (see one/cache.py)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'one.cache.TieredCache',
+        'LOCATION': BASE_DIR / 'cache' / 'default.sqlite3',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+            'FRONT_MAX_ENTRIES': 1000,
+            'FRONT_TIMEOUT': 2,
+            'EARLY_REFRESH_BETA': 1.0,
+            'LOCK_TIMEOUT': 30,
+        },
     }
 }
 
@@ -125,6 +153,22 @@ MEDIA_ROOT = BASE_DIR/'media'
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# collectstatic writes content-hashed names plus .gz/.br siblings; WhiteNoise
+# serves the hashed files with far-future immutable caching and picks the
+# compressed sibling from Accept-Encoding. References to files missing from
+# the build fall back to their unhashed URL instead of raising.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'one.storage.StaticFilesStorage',
+    },
+}
+
+# Unhashed static files (e.g. favicon requests by path) are cached for a day
+WHITENOISE_MAX_AGE = 86400
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -156,3 +200,60 @@ CKEDITOR_5_CONFIGS = {
         'width': '100%',
     }
 }
+
+# Responsive image variants written next to every uploaded gallery/profile/blog image
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 960, 1280, 1920)
+
+# On-demand resized media (/media/r/<w>x<h>/<path>) LRU disk cache
+RESIZE_CACHE_DIR = BASE_DIR / 'cache' / 'resized'
+RESIZE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# The only (width, height) pairs it renders (0 = auto); BLOG_IMAGE_WIDTHS must be listed
+RESIZE_SIZES = [(width, 0) for width in (320, 480, 640, 960, 1280, 1440, 1920)]
+
+# Applicant photo uploads: rejected above this size, stored downscaled to this long side
+APPLICANT_PHOTO_MAX_BYTES = 25 * 1024 * 1024
+APPLICANT_PHOTO_MAX_DIMENSION = 2048
+APPLICANT_PHOTO_MAX_DECODE_PIXELS = 16_000_000
+
+# Media serving: None streams from Django (sendfile via the WSGI file wrapper),
+# 'nginx' answers with X-Accel-Redirect to MEDIA_ACCEL_PREFIX (an internal
+# location aliased to MEDIA_ROOT), 'sendfile' answers with X-Sendfile for
+# Apache/lighttpd.
+MEDIA_ACCEL = None
+MEDIA_ACCEL_PREFIX = '/internal-media/'
+MEDIA_MAX_AGE = 86400
+
+# Hero videos processed by `manage.py build_video_renditions`
+HERO_VIDEOS = ('images/homemain.mp4', 'images/ntavid.mp4')
+
+# Blog view counts are buffered in memory and written every N seconds
+VIEW_COUNT_FLUSH_INTERVAL = 5
+
+# Blog posts per page (keyset paginated, "load more")
+BLOG_PAGE_SIZE = 12
+
+# Model directory cards per page
+MODEL_PAGE_SIZE = 24
+
+# Casting search: in-memory index is fully reloaded at most this often (seconds)
+CASTING_INDEX_RELOAD_INTERVAL = 300
+
+# Bookings without an end time are treated as lasting this long; cached
+# per-model availability is refreshed at least this often (seconds)
+BOOKING_DEFAULT_DURATION_HOURS = 8
+AVAILABILITY_CACHE_TTL = 60
+
+# Rendered model calendar feeds stay cached until a booking changes (or this many seconds)
+CALENDAR_CACHE_TIMEOUT = 24 * 60 * 60
+# ...and list bookings from this many days ago onwards
+CALENDAR_PAST_DAYS = 90
+
+# Full-page cache for the academy/about pages; keys change automatically on deploy
+PAGE_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# Blog bodies are pre-rendered on save: embedded uploads get these resized
+# variants (the plain src uses the largest up to BLOG_IMAGE_WIDTH)
+BLOG_IMAGE_WIDTHS = (480, 960, 1440)
+BLOG_IMAGE_WIDTH = 960
+BLOG_IMAGE_SIZES = '(max-width: 992px) 100vw, 730px'
+BLOG_WORDS_PER_MINUTE = 200
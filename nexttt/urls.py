@@ -8,12 +8,12 @@ The `urlpatterns` list routes URLs to views. For more information, see:
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from one.views import (
-    home, model_list, model_view, model_detail, book_model,
-    model_application_view, nta, ntaessence, ntavision,
+    home, model_list, model_view, model_detail, book_model, casting_search, casting_search_json,
+    model_availability, model_calendar, available_models, model_application_view, nta, ntaessence, ntavision,
     ntacouture, ntaconnect, about, contact,
-    blog_list, blog_detail, course_registration
+    blog_list, blog_list_more, blog_detail, course_registration, resized_media,
+    media_file
 )
 
 urlpatterns = [
@@ -28,6 +28,11 @@ urlpatterns = [
     path('model/<int:pk>/', model_view, name='model-view'),
     path('model/<int:pk>/detail/', model_detail, name='model-detail'),
     path('model/<int:pk>/book/', book_model, name='book-model'),
+    path('model/<int:pk>/availability.json', model_availability, name='model-availability'),
+    path('model/<int:pk>/calendar.ics', model_calendar, name='model-calendar'),
+    path('models/available.json', available_models, name='available-models'),
+    path('models/casting/', casting_search, name='casting-search'),
+    path('models/casting.json', casting_search_json, name='casting-search-json'),
 
     # Model application form
     path('apply/', model_application_view, name='apply_model'),
@@ -46,12 +51,18 @@ urlpatterns = [
 
     # Blog URLs
     path('blogs/', blog_list, name='blog_list'),
+    path('blogs/more/', blog_list_more, name='blog_list_more'),
     path('blogs/<slug:slug>/', blog_detail, name='blog_detail'),
 
+    # On-demand resized media, e.g. /media/r/400x500/models/profiles/leo.jpg
+    path(f"{settings.MEDIA_URL.lstrip('/')}r/<int:width>x<int:height>/<path:path>", resized_media, name='resized-media'),
+
     # CKEditor integration
     path('ckeditor5/', include('django_ckeditor_5.urls')),
 ]
 
-# Serve media files in development mode
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media files, with Range/ETag support and X-Accel-Redirect/X-Sendfile
+# offload when MEDIA_ACCEL is set (see settings)
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", media_file, name='media'),
+]
@@ -1,8 +1,10 @@
 from django.contrib import admin
+from django.urls import reverse
+from .ical import calendar_token
 from .models import (
     Model, Portfolio, Client, Booking,
     ModelApplication, Blog, CourseRegistration,
-    ContactForm, ModelImage
+    ContactForm, ModelImage, MediaBlob, SiteCounter
 )
 
 
@@ -16,7 +18,7 @@ class ModelAdmin(admin.ModelAdmin):
     search_fields = ['name']
     ordering = ['name']
     date_hierarchy = 'created_at'
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'calendar_url']
 
     fieldsets = (
         ('Basic Information', {
@@ -28,12 +30,21 @@ class ModelAdmin(admin.ModelAdmin):
         ('Profile', {
             'fields': ('bio', 'profile_image')
         }),
+        ('Calendar', {
+            'fields': ('calendar_url',)
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
 
+    @admin.display(description="Booking calendar subscription URL")
+    def calendar_url(self, obj):
+        if not obj.pk:
+            return "-"
+        return f"{reverse('model-calendar', args=[obj.pk])}?token={calendar_token(obj.pk)}"
+
     def has_add_permission(self, request):
         return request.user.is_superuser
 
@@ -160,6 +171,31 @@ class ModelImageAdmin(admin.ModelAdmin):
     ordering = ['model', 'order']
 
 
+# -------------------------
+# Media Blob Admin
+# -------------------------
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'refcount', 'created_at']
+    search_fields = ['name']
+    readonly_fields = ['name', 'refcount', 'created_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
+# -------------------------
+# Site Counter Admin
+# -------------------------
+@admin.register(SiteCounter)
+class SiteCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value', 'updated_at']
+    readonly_fields = ['name', 'value', 'updated_at']
+
+    def has_add_permission(self, request):
+        return False
+
+
 # -------------------------
 # Customize Admin Site Titles
 # -------------------------
@@ -0,0 +1,132 @@
+import threading
+import time
+from bisect import bisect_right
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+
+from .models import Booking
+
+# Statuses that occupy a model's time
+BLOCKING_STATUSES = ('pending', 'confirmed')
+# Used when a booking has no real end (the website form only asks for a start)
+DEFAULT_DURATION = timedelta(hours=getattr(settings, 'BOOKING_DEFAULT_DURATION_HOURS', 8))
+# Other processes' booking changes are picked up after at most this many seconds
+CACHE_TTL = getattr(settings, 'AVAILABILITY_CACHE_TTL', 60)
+
+
+def booking_window(start, end):
+    """The half-open interval a booking occupies."""
+    if end is None or end <= start:
+        end = start + DEFAULT_DURATION
+    return start, end
+
+
+class Availability:
+    """A model's busy time as sorted, merged, non-overlapping intervals.
+
+    Both questions are answered with a binary search over the interval ends:
+    ``is_free`` in O(log n), ``free_slots`` in O(log n + slots returned).
+    """
+
+    def __init__(self, windows):
+        starts, ends = [], []
+        for start, end in sorted(windows):
+            if ends and start <= ends[-1]:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self.starts = starts
+        self.ends = ends
+
+    @classmethod
+    def for_model(cls, model_id):
+        rows = Booking.objects.filter(
+            model_id=model_id, status__in=BLOCKING_STATUSES,
+        ).values_list('start_date', 'end_date')
+        return cls(booking_window(start, end) for start, end in rows)
+
+    def is_free(self, start, end):
+        # First busy interval that ends after `start`; free if it starts at or after `end`
+        index = bisect_right(self.ends, start)
+        return index == len(self.starts) or self.starts[index] >= end
+
+    def free_slots(self, after, duration, count=5):
+        """Up to `count` (start, end) gaps of at least `duration` from `after`.
+
+        The last gap may be open-ended, with an end of None.
+        """
+        slots = []
+        cursor = after
+        index = bisect_right(self.ends, after)
+        while len(slots) < count:
+            if index == len(self.starts):
+                slots.append((cursor, None))
+                break
+            if self.starts[index] - cursor >= duration:
+                slots.append((cursor, self.starts[index]))
+            cursor = max(cursor, self.ends[index])
+            index += 1
+        return slots
+
+
+class AvailabilityCache:
+    """Per-process cache of Availability by model id.
+
+    Entries are dropped by the Booking signals in this process when the
+    change commits, so nothing read mid-transaction outlives it, and
+    expire after CACHE_TTL seconds to pick up changes made by other workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, model_id):
+        with self._lock:
+            entry = self._entries.get(model_id)
+        if entry and time.monotonic() - entry[0] < CACHE_TTL:
+            return entry[1]
+        availability = Availability.for_model(model_id)
+        with self._lock:
+            self._entries[model_id] = (time.monotonic(), availability)
+        return availability
+
+    def invalidate(self, model_id):
+        """Drop the entry once the current transaction commits (immediately outside one)."""
+        def drop():
+            with self._lock:
+                self._entries.pop(model_id, None)
+        transaction.on_commit(drop)
+
+
+availability_cache = AvailabilityCache()
+
+
+def find_conflicts(model_id, start, end, exclude=None):
+    """Blocking bookings of `model_id` that overlap [start, end), read fresh from the database."""
+    rows = Booking.objects.filter(overlapping(start, end), model_id=model_id)
+    if exclude is not None:
+        rows = rows.exclude(pk=exclude)
+    return list(rows.only('id', 'start_date', 'end_date', 'status'))
+
+
+def overlapping(start, end):
+    """Q for blocking bookings overlapping [start, end), treating end-less rows as DEFAULT_DURATION long."""
+    return Q(status__in=BLOCKING_STATUSES, start_date__lt=end) & (
+        Q(end_date__gt=start)
+        | Q(end_date__lte=F('start_date'), start_date__gt=start - DEFAULT_DURATION)
+    )
+
+
+def free_models(queryset, start, end):
+    """Restrict a Model queryset to those with no blocking booking in [start, end).
+
+    Compiles to a single NOT EXISTS anti-join, answered per model from the
+    (model, start_date, end_date) index.
+    """
+    busy = Booking.objects.filter(overlapping(start, end), model=OuterRef('pk'))
+    return queryset.filter(~Exists(busy))
@@ -0,0 +1,206 @@
+import math
+import re
+from urllib.parse import unquote, urlsplit
+
+from bs4 import BeautifulSoup, NavigableString
+from bs4.element import PreformattedString
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image
+
+from .resize import RESIZE_SIZES, ResizeError, source_path
+from .search import plain_text
+
+BLOG_IMAGE_WIDTHS = getattr(settings, 'BLOG_IMAGE_WIDTHS', (480, 960, 1440))
+# The plain src (and width/height) uses the largest variant up to this width
+BLOG_IMAGE_WIDTH = getattr(settings, 'BLOG_IMAGE_WIDTH', 960)
+BLOG_IMAGE_SIZES = getattr(settings, 'BLOG_IMAGE_SIZES', '(max-width: 992px) 100vw, 730px')
+BLOG_WORDS_PER_MINUTE = getattr(settings, 'BLOG_WORDS_PER_MINUTE', 200)
+
+# What CKEditor produces with the configured toolbar, plus images pasted in
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'span', 'div',
+    'strong', 'b', 'em', 'i', 'u', 's', 'sub', 'sup', 'mark', 'a',
+    'ul', 'ol', 'li', 'blockquote', 'pre', 'code', 'figure', 'figcaption', 'img',
+    'table', 'caption', 'colgroup', 'col', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td',
+}
+# Removed together with their contents; any other unknown tag is unwrapped
+DROPPED_TAGS = {
+    'script', 'style', 'iframe', 'frame', 'frameset', 'object', 'embed', 'applet', 'noscript', 'template',
+    'form', 'input', 'button', 'select', 'textarea', 'link', 'meta', 'base', 'svg', 'math',
+}
+ALLOWED_ATTRIBUTES = {
+    '*': {'class', 'title', 'lang', 'dir', 'style'},
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'ol': {'start', 'reversed', 'type'},
+    'li': {'value'},
+    'col': {'span'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'td': {'colspan', 'rowspan'},
+}
+# Inline styles the editor's font tools produce; pasted layout styles (widths, margins, mso-*) go
+ALLOWED_STYLES = {'color', 'background-color', 'font-size', 'font-family', 'text-align'}
+URL_SCHEMES = {'', 'http', 'https', 'mailto', 'tel'}
+# Whitespace-only text between these is insignificant
+BLOCK_TAGS = {
+    'p', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'blockquote', 'pre', 'figure',
+    'figcaption', 'table', 'caption', 'colgroup', 'col', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'hr', 'br',
+}
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+# -------------------------
+# Sanitising
+# -------------------------
+def _safe_url(url, schemes=URL_SCHEMES):
+    scheme = urlsplit(url.strip()).scheme.lower()
+    return scheme in schemes
+
+
+def _clean_style(style):
+    declarations = []
+    for declaration in style.split(';'):
+        name, _colon, value = declaration.partition(':')
+        name, value = name.strip().lower(), value.strip()
+        if name in ALLOWED_STYLES and value and not re.search(r'url\(|expression|[\\<>]', value, re.I):
+            declarations.append(f'{name}:{value}')
+    return ';'.join(declarations)
+
+
+def _clean_attributes(tag):
+    allowed = ALLOWED_ATTRIBUTES['*'] | ALLOWED_ATTRIBUTES.get(tag.name, set())
+    for name in list(tag.attrs):
+        if name not in allowed:
+            del tag[name]
+    if 'style' in tag.attrs:
+        style = _clean_style(tag['style'])
+        if style:
+            tag['style'] = style
+        else:
+            del tag['style']
+    if tag.name == 'a':
+        if not _safe_url(tag.get('href', '')):
+            del tag['href']
+        if tag.get('target') == '_blank':
+            tag['rel'] = 'noopener noreferrer'
+    if tag.name == 'img' and not (tag.get('src') and _safe_url(tag['src'], {'', 'http', 'https'})):
+        tag.decompose()
+
+
+def sanitize(soup):
+    # Comments, doctypes, CDATA and processing instructions
+    for node in soup.find_all(string=lambda text: isinstance(text, PreformattedString)):
+        node.extract()
+    for tag in soup.find_all(True):
+        if tag.decomposed:
+            continue
+        if tag.name in DROPPED_TAGS:
+            tag.decompose()
+        elif tag.name not in ALLOWED_TAGS:
+            tag.unwrap()
+    for tag in soup.find_all(True):
+        _clean_attributes(tag)
+
+
+# -------------------------
+# Images
+# -------------------------
+def _media_path(src):
+    """The MEDIA_ROOT-relative path of a local upload URL, or None."""
+    prefix = '/' + settings.MEDIA_URL.strip('/') + '/'
+    parts = urlsplit(src)
+    if parts.scheme or parts.netloc or not parts.path.startswith(prefix):
+        return None
+    return unquote(parts.path[len(prefix):])
+
+
+def _intrinsic_size(full_path):
+    """(width, height) as displayed, i.e. after EXIF rotation; only the header is read."""
+    with Image.open(full_path) as image:
+        width, height = image.size
+        # Orientations 5-8 swap the axes, as ImageOps.exif_transpose does when resizing
+        if image.getexif().get(0x0112) in (5, 6, 7, 8):
+            width, height = height, width
+    return width, height
+
+
+def _resized_url(path, width):
+    return reverse('resized-media', kwargs={'width': width, 'height': 0, 'path': path})
+
+
+def optimise_image(img):
+    """Lazy-load `img`, size it, and point it at resized variants of local uploads."""
+    img['loading'] = 'lazy'
+    img['decoding'] = 'async'
+
+    path = _media_path(img.get('src', ''))
+    if path is None or path.startswith('r/'):
+        return
+    try:
+        full_path = source_path(path)
+        width, height = _intrinsic_size(full_path)
+    except (ResizeError, OSError, Image.DecompressionBombError):
+        return
+
+    widths = [w for w in BLOG_IMAGE_WIDTHS if w < width and (w, 0) in RESIZE_SIZES]
+    if widths and not path.lower().endswith('.gif'):
+        # Resizing would drop a GIF's animation; those keep the original
+        display = max([w for w in widths if w <= BLOG_IMAGE_WIDTH] or widths[:1])
+        img['src'] = _resized_url(path, display)
+        img['srcset'] = ', '.join(f'{_resized_url(path, w)} {w}w' for w in widths)
+        img['sizes'] = BLOG_IMAGE_SIZES
+        height = round(height * display / width)
+        width = display
+    img['width'] = width
+    img['height'] = height
+
+
+# -------------------------
+# Minifying
+# -------------------------
+def _is_boundary(node, parent):
+    # Running out of siblings is only a boundary when the parent is a block (or the document)
+    if node is None:
+        return parent.name in BLOCK_TAGS or parent.parent is None
+    return node.name in BLOCK_TAGS
+
+
+def minify(soup):
+    # Merge the text nodes left next to each other by removed tags
+    soup.smooth()
+    for text in soup.find_all(string=True):
+        if text.find_parent(('pre', 'code')):
+            continue
+        collapsed = WHITESPACE_RE.sub(' ', text)
+        parent = text.parent
+        if collapsed == ' ' and _is_boundary(text.previous_sibling, parent) and _is_boundary(text.next_sibling, parent):
+            text.extract()
+        elif collapsed != text:
+            text.replace_with(NavigableString(collapsed))
+
+
+# -------------------------
+# Entry point
+# -------------------------
+def reading_time(html):
+    """Whole minutes to read `html`, at least one."""
+    words = len(plain_text(html).split())
+    return max(1, math.ceil(words / BLOG_WORDS_PER_MINUTE))
+
+
+def render_blog_content(html):
+    """Return (markup, reading minutes) for a CKEditor body.
+
+    The markup is sanitised to ALLOWED_TAGS/ALLOWED_ATTRIBUTES, stripped of
+    comments and insignificant whitespace, and every image is lazy-loaded
+    and async-decoded. Local uploads also get their intrinsic width/height
+    and a srcset of on-demand resized variants.
+    """
+    soup = BeautifulSoup(html or '', 'html.parser')
+    sanitize(soup)
+    for img in soup.find_all('img'):
+        optimise_image(img)
+    minify(soup)
+    markup = soup.decode(formatter='html5').strip()
+    return markup, reading_time(markup)
@@ -0,0 +1,428 @@
+import atexit
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+import weakref
+import zlib
+from collections import Counter, OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+LOCK_PREFIX = '!lock:'
+STAT_NAMES = ('front_hits', 'back_hits', 'misses', 'sets', 'recomputes', 'early_refreshes', 'coalesced')
+
+# Every live TieredCache, so counters not yet folded into the shared file survive process exit
+_instances = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_all_stats():
+    for instance in list(_instances):
+        try:
+            instance._flush_stats()
+        except sqlite3.Error:
+            pass
+
+
+class TieredCache(BaseCache):
+    """Two-tier cache: a per-process LRU in front of a SQLite file shared by every worker on the host.
+
+    LOCATION is the SQLite file. OPTIONS:
+
+    * FRONT_MAX_ENTRIES: size of the in-process LRU (default 1000).
+    * FRONT_TIMEOUT: seconds an entry may be served from the LRU without
+      asking the shared tier (default 2). Deletes and invalidations made by
+      other workers are visible after at most this long.
+    * MAX_ENTRIES / CULL_FREQUENCY: as for Django's database cache, applied
+      to the shared tier.
+    * EARLY_REFRESH_BETA: get_or_set() recomputes an entry before it
+      expires with a probability that rises as expiry approaches, scaled by
+      how long the value took to compute (default 1.0; 0 disables).
+    * LOCK_TIMEOUT: seconds a worker may hold the recompute lock of a key
+      before others give up waiting and compute it themselves (default 30).
+
+    get_or_set() coalesces misses: one thread in one process computes the
+    value while the others wait for it, or keep serving the old value when
+    it is an early refresh. Hit/miss counters are collected per process and
+    folded into the shared file every STATS_INTERVAL seconds and at exit;
+    see stats().
+    """
+
+    STATS_INTERVAL = 10
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = str(location)
+        self._front_max_entries = int(options.get('FRONT_MAX_ENTRIES', 1000))
+        self._front_timeout = float(options.get('FRONT_TIMEOUT', 2))
+        self._beta = float(options.get('EARLY_REFRESH_BETA', 1.0))
+        self._lock_timeout = float(options.get('LOCK_TIMEOUT', 30))
+
+        # key -> (value bytes, served until, expires, compute seconds)
+        self._front = OrderedDict()
+        self._front_lock = threading.Lock()
+        # Striped locks serialise recomputation of a key between threads of this process
+        self._key_locks = [threading.Lock() for _ in range(64)]
+        self._local = threading.local()
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._stats_flushed = time.monotonic()
+        self._sets_since_cull = 0
+        _instances.add(self)
+
+    # -------------------------
+    # Shared tier (SQLite)
+    # -------------------------
+    def _connection(self):
+        # Per thread, and never inherited across a fork (gunicorn --preload)
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self._path, timeout=5, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(
+            'CREATE TABLE IF NOT EXISTS cache_entry ('
+            ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, delta REAL NOT NULL DEFAULT 0'
+            ') WITHOUT ROWID;'
+            'CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires);'
+            'CREATE TABLE IF NOT EXISTS cache_stat (name TEXT PRIMARY KEY, value INTEGER NOT NULL);'
+        )
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _read(self, keys, now):
+        rows = {}
+        keys = list(keys)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            rows.update(
+                (key, (self._unpack(value), expires, delta))
+                for key, value, expires, delta in self._connection().execute(
+                    f'SELECT key, value, expires, delta FROM cache_entry WHERE key IN ({placeholders})'
+                    ' AND (expires IS NULL OR expires > ?)',
+                    [*chunk, now],
+                )
+            )
+        return rows
+
+    def _write(self, items, expires, delta=0.0):
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache_entry (key, value, expires, delta) VALUES (?, ?, ?, ?)',
+                [(key, self._pack(value), expires, delta) for key, value in items],
+            )
+        self._sets_since_cull += len(items)
+        if self._sets_since_cull >= max(self._max_entries // 10, 1):
+            self._sets_since_cull = 0
+            self._cull()
+
+    def _cull(self):
+        connection = self._connection()
+        with connection:
+            connection.execute('DELETE FROM cache_entry WHERE expires <= ?', [time.time()])
+            count = connection.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+            if count > self._max_entries:
+                # Drop the entries closest to expiry; permanent ones (tag versions) go last, held locks never
+                connection.execute(
+                    'DELETE FROM cache_entry WHERE key IN ('
+                    ' SELECT key FROM cache_entry WHERE key NOT LIKE ? ORDER BY expires IS NULL, expires LIMIT ?)',
+                    [LOCK_PREFIX + '%',
+                     count // self._cull_frequency if self._cull_frequency else count],
+                )
+
+    # -------------------------
+    # Front tier (in-process LRU)
+    # -------------------------
+    def _front_get(self, key, now):
+        with self._front_lock:
+            entry = self._front.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self._front[key]
+                return None
+            self._front.move_to_end(key)
+            return entry
+
+    def _front_put(self, key, value, expires, delta, now):
+        served_until = now + self._front_timeout
+        if expires is not None:
+            served_until = min(served_until, expires)
+        with self._front_lock:
+            self._front[key] = (value, served_until, expires, delta)
+            self._front.move_to_end(key)
+            while len(self._front) > self._front_max_entries:
+                self._front.popitem(last=False)
+
+    def _front_discard(self, keys):
+        with self._front_lock:
+            for key in keys:
+                self._front.pop(key, None)
+
+    def _lookup(self, key, count=True):
+        """(value bytes, expires, delta) from the nearest tier, or None."""
+        now = time.time()
+        entry = self._front_get(key, now)
+        if entry is not None:
+            self._count('front_hits', count)
+            return entry[0], entry[2], entry[3]
+        row = self._read([key], now).get(key)
+        if row is None:
+            self._count('misses', count)
+            return None
+        self._count('back_hits', count)
+        self._front_put(key, *row, now)
+        return row
+
+    # -------------------------
+    # Serialisation
+    # -------------------------
+    # The front tier holds pickles; only the shared tier pays for compression
+    @staticmethod
+    def _dumps(value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(data):
+        return pickle.loads(data)
+
+    @staticmethod
+    def _pack(data):
+        # Rendered pages compress well; the flag byte keeps small values cheap
+        if len(data) > 1024:
+            return b'z' + zlib.compress(data, 1)
+        return b'p' + data
+
+    @staticmethod
+    def _unpack(data):
+        data = bytes(data)
+        if data[:1] == b'z':
+            return zlib.decompress(data[1:])
+        return data[1:]
+
+    # -------------------------
+    # Django cache API
+    # -------------------------
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._lookup(key)
+        return default if entry is None else self._loads(entry[0])
+
+    def get_many(self, keys, version=None):
+        now = time.time()
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found, remote = {}, []
+        for key in keys:
+            entry = self._front_get(key, now)
+            if entry is None:
+                remote.append(key)
+            else:
+                found[key] = entry[0]
+        self._count('front_hits', len(found))
+        if remote:
+            rows = self._read(remote, now)
+            for key, row in rows.items():
+                self._front_put(key, *row, now)
+                found[key] = row[0]
+            self._count('back_hits', len(rows))
+            self._count('misses', len(remote) - len(rows))
+        return {keys[key]: self._loads(value) for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._store({key: value}, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store({self.make_and_validate_key(key, version=version): value for key, value in data.items()}, timeout)
+        return []
+
+    def _store(self, data, timeout, delta=0.0):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        items = [(key, self._dumps(value)) for key, value in data.items()]
+        self._write(items, expires, delta)
+        self._count('sets', len(items))
+        for key, value in items:
+            self._front_put(key, value, expires, delta, now)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        if self._insert_if_absent(key, self._dumps(value), self.get_backend_timeout(timeout)):
+            self._front_discard([key])
+            return True
+        return False
+
+    def _insert_if_absent(self, key, value, expires):
+        # Atomic across processes: an expired row counts as absent
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute(
+                'INSERT INTO cache_entry (key, value, expires) VALUES (?, ?, ?)'
+                ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires, delta = 0'
+                ' WHERE cache_entry.expires IS NOT NULL AND cache_entry.expires <= ?',
+                [key, self._pack(value), expires, time.time()],
+            )
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._front_discard([key])
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute(
+                'UPDATE cache_entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                [self.get_backend_timeout(timeout), key, time.time()],
+            )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._delete([key]) > 0
+
+    def delete_many(self, keys, version=None):
+        self._delete([self.make_and_validate_key(key, version=version) for key in keys])
+
+    def _delete(self, keys):
+        self._front_discard(keys)
+        connection = self._connection()
+        with connection:
+            return connection.executemany('DELETE FROM cache_entry WHERE key = ?', [(key,) for key in keys]).rowcount
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._lookup(key) is not None
+
+    def clear(self):
+        with self._front_lock:
+            self._front.clear()
+        connection = self._connection()
+        with connection:
+            connection.execute('DELETE FROM cache_entry')
+
+    def close(self, **kwargs):
+        # Runs after every request. Connections are per thread and reused
+        # across requests; counters are flushed on the usual interval and at exit
+        if time.monotonic() - self._stats_flushed >= self.STATS_INTERVAL:
+            self._flush_stats()
+
+    # -------------------------
+    # Stampede protection
+    # -------------------------
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """Return the cached value, computing it with `default()` at most once per host."""
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._lookup(key)
+        if entry is not None and not self._refresh_early(entry):
+            return self._loads(entry[0])
+
+        key_lock = self._key_locks[hash(key) % len(self._key_locks)]
+        if entry is None:
+            key_lock.acquire()
+        elif not key_lock.acquire(blocking=False):
+            # Another thread is already refreshing it early: keep serving the current value
+            return self._loads(entry[0])
+        try:
+            if entry is None:
+                # Another thread may have computed it while we waited
+                entry = self._lookup(key, count=False)
+                if entry is not None:
+                    self._count('coalesced')
+                    return self._loads(entry[0])
+            return self._recompute(key, entry, default, timeout)
+        finally:
+            key_lock.release()
+
+    def _recompute(self, key, entry, default, timeout):
+        lock_key = LOCK_PREFIX + key
+        deadline = time.time() + self._lock_timeout
+        while not self._insert_if_absent(lock_key, b'', time.time() + self._lock_timeout):
+            if entry is not None:
+                # Another worker is refreshing it early
+                return self._loads(entry[0])
+            if time.time() >= deadline:
+                break
+            time.sleep(self.POLL_INTERVAL)
+            row = self._read([key], time.time()).get(key)
+            if row is not None:
+                self._count('coalesced')
+                self._front_put(key, *row, time.time())
+                return self._loads(row[0])
+
+        try:
+            started = time.monotonic()
+            value = default() if callable(default) else default
+            self._store({key: value}, timeout, delta=time.monotonic() - started)
+        finally:
+            self._delete([lock_key])
+        self._count('recomputes')
+        if entry is not None:
+            self._count('early_refreshes')
+        return value
+
+    def _refresh_early(self, entry):
+        """XFetch: recompute before expiry with a probability that grows as expiry nears."""
+        _value, expires, delta = entry
+        if expires is None or not delta or not self._beta:
+            return False
+        return time.time() - delta * self._beta * math.log(1.0 - random.random()) >= expires
+
+    # -------------------------
+    # Statistics
+    # -------------------------
+    def _count(self, name, amount=1):
+        if not amount:
+            return
+        with self._stats_lock:
+            self._stats[name] += amount
+        if time.monotonic() - self._stats_flushed >= self.STATS_INTERVAL:
+            self._flush_stats()
+
+    def _flush_stats(self):
+        with self._stats_lock:
+            pending, self._stats = self._stats, Counter()
+            self._stats_flushed = time.monotonic()
+        if not pending:
+            return
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                'INSERT INTO cache_stat (name, value) VALUES (?, ?)'
+                ' ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+                list(pending.items()),
+            )
+
+    def stats(self):
+        """Host-wide counters (all workers, up to STATS_INTERVAL behind) plus entry counts."""
+        self._flush_stats()
+        connection = self._connection()
+        counts = dict.fromkeys(STAT_NAMES, 0)
+        counts.update(connection.execute('SELECT name, value FROM cache_stat'))
+        lookups = counts['front_hits'] + counts['back_hits'] + counts['misses']
+        counts['hit_ratio'] = (counts['front_hits'] + counts['back_hits']) / lookups if lookups else 0.0
+        counts['entries'] = connection.execute(
+            'SELECT COUNT(*) FROM cache_entry WHERE expires IS NULL OR expires > ?', [time.time()]
+        ).fetchone()[0]
+        with self._front_lock:
+            counts['front_entries'] = len(self._front)
+        return counts
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = Counter()
+        connection = self._connection()
+        with connection:
+            connection.execute('DELETE FROM cache_stat')
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .models import Model
+
+# Measurement columns, in matrix order
+FEATURES = ('height', 'chest_bust_size', 'waist', 'hips', 'shoe_size')
+DEFAULT_WEIGHTS = {
+    'height': 2.0,
+    'chest_bust_size': 1.0,
+    'waist': 1.0,
+    'hips': 1.0,
+    'shoe_size': 0.5,
+}
+# Other processes' edits are picked up by a full reload at most this often
+RELOAD_INTERVAL = getattr(settings, 'CASTING_INDEX_RELOAD_INTERVAL', 300)
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        # shoe_size is free text; anything non-numeric is treated as unknown
+        return np.nan
+
+
+def _row(values):
+    return [_number(values[name]) for name in FEATURES]
+
+
+class CastingIndex:
+    """In-memory matrix of active models' measurements for nearest-neighbour search.
+
+    Rows hold raw centimetres (and shoe size). Queries scale every column by
+    its standard deviation across the roster, so a 1 cm height difference
+    and a 1 cm waist difference count in proportion to how much each varies,
+    then rank by weighted Euclidean distance over the features the query
+    specifies. Unknown measurements count as the roster mean.
+
+    ``update()``/``remove()`` keep the index current for saves in this
+    process; edits made elsewhere are picked up by a full reload every
+    RELOAD_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._genders = np.empty(0, dtype=object)
+        self._matrix = np.empty((0, len(FEATURES)))
+
+    def _load(self):
+        rows = list(Model.objects.filter(status='active').values('pk', 'gender', *FEATURES))
+        self._ids = np.array([row['pk'] for row in rows], dtype=np.int64)
+        self._genders = np.array([row['gender'] for row in rows], dtype=object)
+        self._matrix = np.array([_row(row) for row in rows], dtype=float).reshape(len(rows), len(FEATURES))
+        self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > RELOAD_INTERVAL:
+            self._load()
+
+    def update(self, model):
+        """Add, refresh or drop `model`'s row to match its current status."""
+        if model.status != 'active':
+            self.remove(model.pk)
+            return
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            values = {name: getattr(model, name) for name in FEATURES}
+            positions = np.flatnonzero(self._ids == model.pk)
+            if positions.size:
+                # Copy on write: a concurrent query may still be reading the old arrays
+                self._matrix = self._matrix.copy()
+                self._genders = self._genders.copy()
+                self._matrix[positions[0]] = _row(values)
+                self._genders[positions[0]] = model.gender
+            else:
+                self._ids = np.append(self._ids, model.pk)
+                self._genders = np.append(self._genders, np.array([model.gender], dtype=object))
+                self._matrix = np.vstack([self._matrix, _row(values)])
+
+    def remove(self, pk):
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            keep = self._ids != pk
+            self._ids, self._genders, self._matrix = self._ids[keep], self._genders[keep], self._matrix[keep]
+
+    def nearest(self, target, k=10, gender=None, weights=None):
+        """Return [(model pk, distance)] for the `k` models closest to `target`.
+
+        `target` maps feature names to values; features left out (or None)
+        are ignored. Distances are in roster standard deviations.
+        """
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        columns = [i for i, name in enumerate(FEATURES) if target.get(name) is not None]
+
+        with self._lock:
+            self._ensure_loaded()
+            ids, genders, matrix = self._ids, self._genders, self._matrix
+
+        if gender:
+            mask = genders == gender
+            ids, matrix = ids[mask], matrix[mask]
+        if not ids.size:
+            return []
+        if not columns:
+            return [(int(pk), 0.0) for pk in ids[:k]]
+
+        data = matrix[:, columns]
+        means = np.nanmean(data, axis=0)
+        data = np.where(np.isnan(data), means, data)
+        scale = np.nanstd(data, axis=0)
+        scale[~(scale > 0)] = 1.0
+
+        query = np.array([float(target[FEATURES[i]]) for i in columns])
+        column_weights = np.array([weights[FEATURES[i]] for i in columns])
+        distances = np.sqrt((((data - query) / scale) ** 2 * column_weights).sum(axis=1) / column_weights.sum())
+
+        k = min(k, ids.size)
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind='stable')]
+        return [(int(ids[i]), float(distances[i])) for i in nearest]
+
+
+casting_index = CastingIndex()
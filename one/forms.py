@@ -1,5 +1,6 @@
 from django import forms
-from .models import ModelApplication, CourseRegistration, ContactForm
+from django.http import QueryDict
+from .models import Model, ModelApplication, CourseRegistration, ContactForm
 
 
 # -------------------------
@@ -33,6 +34,20 @@ class ModelApplicationForm(forms.ModelForm):
             'instagram': forms.TextInput(attrs={'placeholder': 'instagram_handle'}),
         }
 
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Photos rejected by ApplicantPhotoUploadHandler while streaming
+        self.upload_errors = upload_errors or {}
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for field, message in self.upload_errors.items():
+            if field in self.fields:
+                # Replace the generic "required" error with the real reason
+                self._errors.pop(field, None)
+                self.add_error(field, message)
+        return cleaned_data
+
 
 # -------------------------
 # Course Registration Form
@@ -96,3 +111,106 @@ class ContactFormForm(forms.ModelForm):
         if len(message) < 10:
             raise forms.ValidationError("Message must be at least 10 characters long.")
         return message
+
+
+# -------------------------
+# Model Directory Filters
+# -------------------------
+class ModelDirectoryFilterForm(forms.Form):
+    # Slider tracks in cm; a handle left at the end of its track does not filter
+    RANGES = {
+        'height': (150, 200),
+        'chest_bust_size': (70, 120),
+        'waist': (50, 100),
+        'hips': (70, 120),
+    }
+    RANGE_LABELS = {'chest_bust_size': 'Chest/Bust'}
+
+    gender = forms.ChoiceField(
+        choices=[('', 'Any')] + Model.GENDER_CHOICES, required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    shoe_size = forms.ChoiceField(
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+
+    def __init__(self, data=None, *args, shoe_sizes=(), **kwargs):
+        if data is not None:
+            # Range inputs with no value render at the middle of the track
+            data = data.copy()
+            for name, (low, high) in self.RANGES.items():
+                data.setdefault(f'{name}_min', low)
+                data.setdefault(f'{name}_max', high)
+        super().__init__(data, *args, **kwargs)
+
+        for name, (low, high) in self.RANGES.items():
+            for bound, initial in (('min', low), ('max', high)):
+                self.fields[f'{name}_{bound}'] = forms.DecimalField(
+                    required=False, min_value=low, max_value=high, initial=initial,
+                    widget=forms.NumberInput(attrs={
+                        'type': 'range', 'min': low, 'max': high, 'step': 1, 'class': 'form-range',
+                    }),
+                )
+        self.fields['shoe_size'].choices = [('', 'Any')] + [(size, size) for size in shoe_sizes]
+
+    def range_fields(self):
+        """(label, min bound field, max bound field) per slider, for the template."""
+        return [
+            (self.RANGE_LABELS.get(name, name.title()), self[f'{name}_min'], self[f'{name}_max'])
+            for name in self.RANGES
+        ]
+
+    def canonical_query(self):
+        """The cleaned filters as a QueryDict, leaving out values that do not filter."""
+        defaults = {f'{name}_{bound}': limit for name, limits in self.RANGES.items()
+                    for bound, limit in zip(('min', 'max'), limits)}
+        query = QueryDict(mutable=True)
+        for name, value in self.cleaned_data.items():
+            if value in (None, '') or defaults.get(name) == value:
+                continue
+            query[name] = format(value.normalize(), 'f') if name in defaults else value
+        return query
+
+    def filter(self, queryset):
+        """Apply every valid filter to `queryset`; invalid values are ignored."""
+        self.is_valid()
+        data = self.cleaned_data
+        if data.get('gender'):
+            queryset = queryset.filter(gender=data['gender'])
+        for name, (low, high) in self.RANGES.items():
+            minimum, maximum = data.get(f'{name}_min'), data.get(f'{name}_max')
+            if minimum is not None and minimum > low:
+                queryset = queryset.filter(**{f'{name}__gte': minimum})
+            if maximum is not None and maximum < high:
+                queryset = queryset.filter(**{f'{name}__lte': maximum})
+        if data.get('shoe_size'):
+            queryset = queryset.filter(shoe_size=data['shoe_size'])
+        return queryset
+
+
+# -------------------------
+# Casting Search
+# -------------------------
+class CastingSearchForm(forms.Form):
+    height = forms.DecimalField(required=False, min_value=100, max_value=230, label="Height (cm)")
+    chest_bust_size = forms.DecimalField(required=False, min_value=40, max_value=160, label="Chest/Bust (cm)")
+    waist = forms.DecimalField(required=False, min_value=30, max_value=150, label="Waist (cm)")
+    hips = forms.DecimalField(required=False, min_value=40, max_value=170, label="Hips (cm)")
+    shoe_size = forms.DecimalField(required=False, min_value=1, max_value=60, label="Shoe")
+    gender = forms.ChoiceField(choices=[('', 'Any')] + Model.GENDER_CHOICES, required=False)
+    k = forms.IntegerField(required=False, min_value=1, max_value=50, initial=12, label="Results")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            css_class = 'form-select' if isinstance(field, forms.ChoiceField) else 'form-control'
+            field.widget.attrs.setdefault('class', css_class)
+
+    def target(self):
+        """The measurements to match, as {feature: float}."""
+        return {
+            name: float(self.cleaned_data[name])
+            for name in ('height', 'chest_bust_size', 'waist', 'hips', 'shoe_size')
+            if self.cleaned_data.get(name) is not None
+        }
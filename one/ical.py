@@ -0,0 +1,138 @@
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .availability import booking_window
+from .models import Booking, Model
+
+CACHE_TIMEOUT = getattr(settings, 'CALENDAR_CACHE_TIMEOUT', 24 * 60 * 60)
+# Bookings that ended longer ago than this are left out of the feed
+PAST_DAYS = getattr(settings, 'CALENDAR_PAST_DAYS', 90)
+TOKEN_SALT = 'one.model-calendar'
+# Statuses shown in the feed, with their iCalendar STATUS
+EVENT_STATUSES = {
+    'pending': 'TENTATIVE',
+    'confirmed': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+}
+
+
+# -------------------------
+# Subscription tokens
+# -------------------------
+def calendar_token(model_id):
+    """Unguessable token for a model's feed URL (calendar apps can't log in)."""
+    return signing.Signer(salt=TOKEN_SALT).signature(str(model_id))
+
+
+def valid_token(model_id, token):
+    return signing.constant_time_compare(calendar_token(model_id), token)
+
+
+# -------------------------
+# Rendering
+# -------------------------
+def escape_text(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def fold(line):
+    """Fold a content line at 75 octets, as RFC 5545 requires."""
+    data = line.encode()
+    if len(data) <= 75:
+        return line
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        # Don't split a UTF-8 sequence
+        while limit < len(data) and (data[limit] & 0xC0) == 0x80:
+            limit -= 1
+        parts.append(data[:limit].decode())
+        data = data[limit:]
+    return '\r\n '.join(parts)
+
+
+def render_feed(model, bookings):
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//NEXTTTONE//Model Schedule//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(model.name)} bookings',
+    ]
+    for booking in bookings:
+        start, end = booking_window(booking.start_date, booking.end_date)
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:booking-{booking.pk}@nextttone',
+            f'DTSTAMP:{format_datetime(booking.updated_at)}',
+            f'LAST-MODIFIED:{format_datetime(booking.updated_at)}',
+            f'DTSTART:{format_datetime(start)}',
+            f'DTEND:{format_datetime(end)}',
+            f'SUMMARY:{escape_text(booking.title)} ({escape_text(booking.get_booking_type_display())})',
+            f'LOCATION:{escape_text(booking.location)}',
+            f'STATUS:{EVENT_STATUSES[booking.status]}',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(fold(line) for line in lines) + '\r\n'
+
+
+# -------------------------
+# Cached feed
+# -------------------------
+def cache_key(model_id):
+    return f'ical:model:{model_id}'
+
+
+def model_feed(model_id):
+    """Return {'body', 'etag', 'last_modified'} for a model's booking feed.
+
+    Covers bookings from PAST_DAYS ago onwards. Cached until the model or
+    one of its bookings is saved or deleted (see invalidate()), so a poll
+    that hits the cache runs no queries. The ETag
+    covers the newest change and the row count, so deletions change it too;
+    Last-Modified is the newest change to the model or any of its bookings,
+    shown or not. Raises Model.DoesNotExist.
+    """
+    return cache.get_or_set(cache_key(model_id), lambda: _build_feed(model_id), CACHE_TIMEOUT)
+
+
+def _build_feed(model_id):
+    model = Model.objects.only('id', 'name', 'updated_at').get(pk=model_id)
+    since = timezone.now() - timedelta(days=PAST_DAYS)
+    shown = Q(start_date__gte=since) | Q(end_date__gte=since), Q(status__in=EVENT_STATUSES)
+    bookings = Booking.objects.filter(*shown, model=model).order_by('start_date', 'pk')
+    # The newest change covers every booking, so cancelling one moves it forward;
+    # deleting one touches the model (one.signals)
+    stats = Booking.objects.filter(model=model).aggregate(
+        newest=Max('updated_at'), count=Count('pk', filter=Q(*shown)),
+    )
+    newest = max(filter(None, (stats['newest'], model.updated_at)))
+    fingerprint = f"{model.pk}:{newest.isoformat()}:{stats['count']}:{model.name}"
+    return {
+        'body': render_feed(model, bookings.only(
+            'id', 'title', 'booking_type', 'location', 'status', 'start_date', 'end_date', 'updated_at',
+        )),
+        'etag': '"%s"' % hashlib.sha1(fingerprint.encode()).hexdigest(),
+        'last_modified': int(newest.timestamp()),
+    }
+
+
+def invalidate(model_id):
+    """Drop the cached feed once the current transaction commits (immediately outside one)."""
+    transaction.on_commit(lambda: cache.delete(cache_key(model_id)))
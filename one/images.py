@@ -0,0 +1,202 @@
+import base64
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import ExifTags, Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_ROOT = 'derivatives'
+DERIVATIVE_WIDTHS = getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 960, 1280, 1920))
+PLACEHOLDER_SIZE = 16
+DERIVATIVE_FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 78, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True},
+}
+
+
+# -------------------------
+# Derivative naming
+# -------------------------
+def derivative_dir(name):
+    """Directory holding every derivative of the original file `name`.
+
+    Named after the full file name, extension included, so `leo.png` and a
+    `leo.jpg` that replaces it never share (or delete) each other's variants.
+    """
+    return posixpath.join(DERIVATIVE_ROOT, name)
+
+
+def derivative_name(name, width, ext):
+    return posixpath.join(derivative_dir(name), f'{width}.{ext}')
+
+
+def _variants_key(name):
+    return 'derivatives:' + hashlib.md5(name.encode()).hexdigest()
+
+
+def derivative_widths(width):
+    """Widths to generate for an original that is `width` pixels wide.
+
+    Never upscales: configured widths smaller than the original are kept and
+    the original width itself (capped at the largest configured width) closes
+    the set, so there is always a candidate for the widest slot.
+    """
+    largest = max(DERIVATIVE_WIDTHS)
+    widths = {w for w in DERIVATIVE_WIDTHS if w < width}
+    widths.add(min(width, largest))
+    return sorted(widths)
+
+
+# -------------------------
+# Generation
+# -------------------------
+def flatten_to_rgb(image):
+    """Return an RGB copy of `image`, compositing transparency onto white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def has_transparency(image):
+    """True if `image` has an alpha channel that is actually used."""
+    if image.mode == 'P':
+        return 'transparency' in image.info
+    if image.mode in ('RGBA', 'LA'):
+        return image.getchannel('A').getextrema()[0] < 255
+    return False
+
+
+def encode_optimized(image, max_dimension=None, quality=85):
+    """Re-encode `image` for the web and return (bytes, extension).
+
+    Applies EXIF orientation, caps the longest side at `max_dimension` and
+    drops all metadata. Images with real transparency stay PNG; everything
+    else becomes a progressive JPEG.
+    """
+    image = ImageOps.exif_transpose(image)
+    if max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS, reducing_gap=3.0)
+
+    buffer = BytesIO()
+    if has_transparency(image):
+        image.convert('RGBA').save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue(), '.png'
+    image.convert('RGB').save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue(), '.jpg'
+
+
+def generate_derivatives(field_file):
+    """Write the resized WebP/JPEG variants of `field_file` to its storage.
+
+    Variants always go to the default media storage, whatever storage the
+    field itself uses. Existing variants for the same name are removed
+    first, so none of a previous file's widths linger. The widths written
+    are recorded for available_derivatives() and returned.
+    """
+    storage = default_storage
+    name = field_file.name
+
+    with field_file.storage.open(name, 'rb') as fh:
+        with Image.open(fh) as original:
+            image = flatten_to_rgb(ImageOps.exif_transpose(original))
+
+    delete_derivatives(name)
+    widths = derivative_widths(image.width)
+    for width in reversed(widths):
+        height = max(1, round(image.height * width / image.width))
+        if width != image.width:
+            image = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for ext, options in DERIVATIVE_FORMATS.items():
+            buffer = BytesIO()
+            image.save(buffer, **options)
+            storage.save(derivative_name(name, width, ext), ContentFile(buffer.getvalue()))
+    cache.set(_variants_key(name), {ext: widths for ext in DERIVATIVE_FORMATS}, None)
+    return widths
+
+
+def available_derivatives(field_file):
+    """Return {ext: [width, ...]} for the variants present on disk.
+
+    Read from the cache, where generate_derivatives() records what it
+    wrote; only variants built before that (or evicted entries) cost a
+    directory listing. An image that has never been processed simply
+    returns an empty dict, which is not cached, so variants generated
+    later are never hidden behind it.
+    """
+    key = _variants_key(field_file.name)
+    found = cache.get(key)
+    if found:
+        return found
+    try:
+        _dirs, files = default_storage.listdir(derivative_dir(field_file.name))
+    except (FileNotFoundError, NotImplementedError):
+        files = []
+
+    found = {}
+    for filename in files:
+        stem, _dot, ext = filename.partition('.')
+        if ext in DERIVATIVE_FORMATS and stem.isdigit():
+            found.setdefault(ext, []).append(int(stem))
+    for widths in found.values():
+        widths.sort()
+    if found:
+        cache.set(key, found, None)
+    return found
+
+
+def delete_derivatives(name):
+    """Remove every variant of the original file `name`."""
+    cache.delete(_variants_key(name))
+    directory = derivative_dir(name)
+    try:
+        _dirs, files = default_storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for filename in files:
+        default_storage.delete(posixpath.join(directory, filename))
+
+
+def ensure_derivatives(field_file):
+    """Generate variants for `field_file` unless they already exist."""
+    if not field_file or available_derivatives(field_file):
+        return
+    try:
+        generate_derivatives(field_file)
+    except (OSError, Image.DecompressionBombError) as exc:
+        logger.warning("Could not build derivatives for %s: %s", field_file.name, exc)
+
+
+# -------------------------
+# Placeholders
+# -------------------------
+def image_metadata(field_file):
+    """Return (width, height, placeholder) for `field_file`.
+
+    Width and height are the intrinsic size after EXIF orientation, read from
+    the header. The placeholder is a data URI of a tiny WebP (a few hundred
+    bytes) that the browser stretches behind the real image while it loads.
+    """
+    with field_file.storage.open(field_file.name, 'rb') as fh:
+        with Image.open(fh) as original:
+            width, height = original.size
+            if original.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+                width, height = height, width
+            # JPEGs decode at 1/8 scale here, so this never loads full resolution
+            original.draft('RGB', (PLACEHOLDER_SIZE * 8, PLACEHOLDER_SIZE * 8))
+            image = flatten_to_rgb(ImageOps.exif_transpose(original))
+    image.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.LANCZOS)
+
+    buffer = BytesIO()
+    image.save(buffer, format='WEBP', quality=30)
+    placeholder = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+    return width, height, placeholder
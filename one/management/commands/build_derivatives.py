@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from one.images import ensure_derivatives, generate_derivatives
+from one.signals import RESPONSIVE_IMAGE_FIELDS
+
+
+class Command(BaseCommand):
+    help = "Generate responsive WebP/JPEG variants for every gallery, profile and blog image."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Rebuild variants even when they already exist.",
+        )
+
+    def handle(self, *args, **options):
+        build = generate_derivatives if options['force'] else ensure_derivatives
+        for model_class, field_names in RESPONSIVE_IMAGE_FIELDS.items():
+            for instance in model_class.objects.only('pk', *field_names).iterator():
+                for field_name in field_names:
+                    field_file = getattr(instance, field_name)
+                    if not field_file:
+                        continue
+                    try:
+                        build(field_file)
+                    except OSError as exc:
+                        self.stderr.write(f"{model_class.__name__} {instance.pk}: {exc}")
+                        continue
+                    self.stdout.write(f"{model_class.__name__} {instance.pk}: {field_file.name}")
+        self.stdout.write(self.style.SUCCESS("Derivatives are up to date."))
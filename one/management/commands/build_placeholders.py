@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from one.signals import IMAGE_METADATA_FIELDS, store_image_metadata
+
+
+class Command(BaseCommand):
+    help = "Store intrinsic size and a low-quality placeholder for gallery and profile images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Recompute placeholders that already exist.",
+        )
+
+    def handle(self, *args, **options):
+        for model_class, field_name in IMAGE_METADATA_FIELDS.items():
+            rows = model_class.objects.exclude(**{field_name: ''})
+            if not options['force']:
+                rows = rows.filter(**{f'{field_name}_placeholder': ''})
+            for pk, name in rows.values_list('pk', field_name).iterator():
+                try:
+                    store_image_metadata(model_class, pk, field_name, name)
+                except OSError as exc:
+                    self.stderr.write(f"{model_class.__name__} {pk}: {exc}")
+                    continue
+                self.stdout.write(f"{model_class.__name__} {pk}: {name}")
+        self.stdout.write(self.style.SUCCESS("Placeholders are up to date."))
@@ -0,0 +1,28 @@
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+
+from one.video import HERO_VIDEOS, build_renditions
+
+
+class Command(BaseCommand):
+    help = "Extract poster frames and build lower-resolution WebM renditions of the hero videos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'videos', nargs='*',
+            help="Static paths of the videos (default: settings.HERO_VIDEOS).",
+        )
+        parser.add_argument(
+            '--poster-at', type=float, default=1.0,
+            help="Time in seconds of the frame used as poster (default 1.0).",
+        )
+
+    def handle(self, *args, **options):
+        for video in options['videos'] or HERO_VIDEOS:
+            source = finders.find(video)
+            if source is None:
+                self.stderr.write(f"{video}: not found in static files, skipped")
+                continue
+            for path in build_renditions(source, options['poster_at']):
+                self.stdout.write(f"{video}: wrote {path}")
+        self.stdout.write(self.style.SUCCESS("Run collectstatic to publish the renditions."))
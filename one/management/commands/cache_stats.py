@@ -0,0 +1,22 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss statistics of the shared cache, summed over all workers on this host."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zero the counters after printing them.")
+
+    def handle(self, *args, **options):
+        if not hasattr(cache, 'stats'):
+            raise CommandError("The default cache backend does not collect statistics.")
+        stats = cache.stats()
+        for name, value in stats.items():
+            if name == 'hit_ratio':
+                self.stdout.write(f"{name}: {value:.1%}")
+            else:
+                self.stdout.write(f"{name}: {value}")
+        if options['reset']:
+            cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
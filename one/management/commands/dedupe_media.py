@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from one.signals import CONTENT_ADDRESSED_FIELDS
+from one.storage import content_addressed_storage
+
+
+class Command(BaseCommand):
+    help = "Move legacy uploads into content-addressed blobs so duplicate files share one copy."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete-originals', action='store_true',
+            help="Remove each legacy file once it has been moved into a blob.",
+        )
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage
+        moved = {}
+
+        for model_class, field_names in CONTENT_ADDRESSED_FIELDS.items():
+            for instance in model_class.objects.iterator():
+                changed = []
+                for field_name in field_names:
+                    field_file = getattr(instance, field_name)
+                    name = field_file.name
+                    if not name or storage.is_blob(name):
+                        continue
+                    if name not in moved:
+                        if not storage.exists(name):
+                            self.stderr.write(f"{model_class.__name__} {instance.pk}: missing {name}")
+                            continue
+                        with storage.open(name, 'rb') as fh:
+                            moved[name] = storage.save(name, fh)
+                    field_file.name = moved[name]
+                    changed.append(field_name)
+                    self.stdout.write(f"{name} -> {moved[name]}")
+
+                if changed:
+                    # save() goes through the signals, which take the blob references
+                    with transaction.atomic():
+                        instance.save(update_fields=changed)
+
+        if options['delete_originals']:
+            for name in moved:
+                storage.delete(name)
+
+        blobs = len(set(moved.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {len(moved)} files into {blobs} blobs ({len(moved) - blobs} duplicates removed)."
+        ))
@@ -0,0 +1,154 @@
+import csv
+import os
+import posixpath
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from PIL import Image
+
+from one.images import DERIVATIVE_ROOT, encode_optimized
+
+RECOMPRESSIBLE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+REPORT_FIELDS = ['name', 'new_name', 'old_bytes', 'new_bytes', 'saved_bytes', 'status']
+
+
+def _recompress(path, max_dimension, quality):
+    """Worker: return (encoded bytes, extension, original size) for `path`."""
+    old_size = os.path.getsize(path)
+    with Image.open(path) as original:
+        data, ext = encode_optimized(original, max_dimension, quality)
+    return data, ext, old_size
+
+
+def _is_blob(storage, name):
+    # Content-addressed blobs are shared and reference counted; never delete them directly.
+    return hasattr(storage, 'is_blob') and storage.is_blob(name)
+
+
+def _auto_now_fields(model_class):
+    return [f.name for f in model_class._meta.concrete_fields if getattr(f, 'auto_now', False)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-encode oversized PNG/JPEG originals referenced by any ImageField in "
+        "the 'one' app. Runs in a process pool, strips metadata, applies EXIF "
+        "orientation, caps dimensions and repoints the fields at the new files. "
+        "Progress is journaled to a CSV report so an interrupted run resumes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-dimension', type=int, default=2560,
+                            help="Longest side in pixels after re-encoding (default 2560).")
+        parser.add_argument('--quality', type=int, default=85,
+                            help="JPEG quality (default 85).")
+        parser.add_argument('--min-bytes', type=int, default=300 * 1024,
+                            help="Only touch files at least this large (default 300 KB).")
+        parser.add_argument('--min-saving', type=float, default=0.1,
+                            help="Keep a result only if it saves this fraction (default 0.1).")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help="Worker processes (default: number of CPUs).")
+        parser.add_argument('--report', default='optimize_media_report.csv',
+                            help="CSV report; existing rows are skipped on the next run.")
+        parser.add_argument('--delete-originals', action='store_true',
+                            help="Delete replaced files that are not content-addressed blobs.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report savings without writing files or touching the database.")
+
+    def handle(self, *args, **options):
+        done = self._read_report(options['report'])
+        references = self._collect_references(done, options['min_bytes'])
+        if not references:
+            self.stdout.write("Nothing to optimize.")
+            return
+
+        self.stdout.write(f"Recompressing {len(references)} files with {options['workers']} workers...")
+        total_saved = 0
+        new_report = not os.path.exists(options['report'])
+        with open(options['report'], 'a', newline='') as report_file:
+            report = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+            if new_report:
+                report.writeheader()
+
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                futures = {
+                    executor.submit(_recompress, refs[0][3].path(name), options['max_dimension'], options['quality']): name
+                    for name, refs in references.items()
+                }
+                for future in as_completed(futures):
+                    name = futures[future]
+                    row = self._apply(name, references[name], future, options)
+                    report.writerow(row)
+                    report_file.flush()
+                    total_saved += row['saved_bytes']
+                    self.stdout.write(f"{row['status']:>9} {name} ({row['saved_bytes']} bytes saved)")
+
+        self.stdout.write(self.style.SUCCESS(f"Saved {total_saved / 1024 / 1024:.1f} MB."))
+
+    def _read_report(self, path):
+        if not os.path.exists(path):
+            return set()
+        done = set()
+        with open(path, newline='') as fh:
+            for row in csv.DictReader(fh):
+                # Dry runs and errors are retried; optimized outputs are never reprocessed.
+                if row['status'] in ('optimized', 'skipped'):
+                    done.update(name for name in (row['name'], row['new_name']) if name)
+        return done
+
+    def _collect_references(self, done, min_bytes):
+        """Map each candidate file name to the (model, pk, field, storage) rows using it."""
+        references = defaultdict(list)
+        for model_class in apps.get_app_config('one').get_models():
+            image_fields = [f for f in model_class._meta.get_fields() if isinstance(f, models.ImageField)]
+            for field in image_fields:
+                rows = model_class.objects.exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True})
+                for pk, name in rows.values_list('pk', field.name).iterator():
+                    if name in done or name.startswith(f'{DERIVATIVE_ROOT}/'):
+                        continue
+                    if not name.lower().endswith(RECOMPRESSIBLE_EXTENSIONS):
+                        continue
+                    references[name].append((model_class, pk, field.name, field.storage))
+
+        candidates = {}
+        for name, refs in references.items():
+            storage = refs[0][3]
+            if storage.exists(name) and storage.size(name) >= min_bytes:
+                candidates[name] = refs
+        return candidates
+
+    def _apply(self, name, refs, future, options):
+        row = {'name': name, 'new_name': '', 'old_bytes': 0, 'new_bytes': 0, 'saved_bytes': 0}
+        try:
+            data, ext, old_size = future.result()
+        except Exception as exc:
+            return {**row, 'status': f'error: {exc}'}
+
+        row.update(old_bytes=old_size, new_bytes=len(data))
+        if len(data) > old_size * (1 - options['min_saving']):
+            return {**row, 'new_bytes': old_size, 'status': 'skipped'}
+        if options['dry_run']:
+            return {**row, 'saved_bytes': old_size - len(data), 'status': 'dry-run'}
+
+        storage = refs[0][3]
+        new_name = storage.save(posixpath.splitext(name)[0] + ext, ContentFile(data))
+        try:
+            with transaction.atomic():
+                for model_class, pk, field_name, _storage in refs:
+                    instance = model_class.objects.get(pk=pk)
+                    getattr(instance, field_name).name = new_name
+                    # save() rather than update() so blob refcounts, derivatives and cached
+                    # pages follow; the auto_now fields move so page validators change too
+                    instance.save(update_fields=[field_name, *_auto_now_fields(model_class)])
+        except Exception as exc:
+            if not _is_blob(storage, new_name):
+                storage.delete(new_name)
+            return {**row, 'status': f'error: {exc}'}
+
+        if options['delete_originals'] and not _is_blob(storage, name):
+            storage.delete(name)
+        return {**row, 'new_name': new_name, 'saved_bytes': old_size - len(data), 'status': 'optimized'}
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from one.models import Blog
+from one.search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite FTS5 full-text index used by the blog search."
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError("Full-text search needs the SQLite database backend.")
+        count = rebuild_index(Blog.objects.all())
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} blog posts."))
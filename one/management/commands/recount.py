@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from one.models import SiteCounter
+
+
+class Command(BaseCommand):
+    help = "Recompute the home page statistics counters from their source tables."
+
+    def handle(self, *args, **options):
+        before = SiteCounter.values()
+        for name, value in SiteCounter.recount().items():
+            drift = value - before[name]
+            note = f" (corrected by {drift:+d})" if drift else ""
+            self.stdout.write(f"{name}: {value}{note}")
+        self.stdout.write(self.style.SUCCESS("Counters are up to date."))
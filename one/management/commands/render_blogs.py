@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from one.models import Blog
+
+
+class Command(BaseCommand):
+    help = "Re-render stored blog bodies, e.g. after changing the BLOG_IMAGE_* settings or uploading embedded images."
+
+    def handle(self, *args, **options):
+        count = 0
+        for blog in Blog.objects.iterator():
+            # A full save() so updated_on moves and cached pages revalidate
+            blog.save()
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rendered {count} blog posts."))
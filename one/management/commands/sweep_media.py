@@ -0,0 +1,101 @@
+import os
+import posixpath
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from one.images import DERIVATIVE_ROOT, delete_derivatives
+from one.models import MediaBlob
+from one.signals import CONTENT_ADDRESSED_FIELDS
+from one.storage import content_addressed_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete blobs nothing refers to (left behind when a save rolled back), "
+        "and responsive variants whose original no longer exists."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help="Only delete unreferenced files older than this many hours, so uploads "
+                 "whose transaction is still open are left alone (default 24).",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="List what would be deleted without deleting anything.",
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        cutoff = time.time() - options['min_age'] * 3600
+        storage = content_addressed_storage
+        removed = 0
+
+        # Rows whose deferred delete never ran (e.g. the process died after commit)
+        for name in MediaBlob.objects.filter(refcount=0).values_list('name', flat=True):
+            self.remove(name)
+            if not self.dry_run:
+                MediaBlob._delete_unreferenced(name, storage)
+            removed += 1
+
+        referenced = set(MediaBlob.objects.values_list('name', flat=True))
+        for model_class, field_names in CONTENT_ADDRESSED_FIELDS.items():
+            for names in model_class.objects.values_list(*field_names):
+                referenced.update(names)
+
+        for name in self.files(storage, storage.blob_prefix):
+            if name not in referenced and os.path.getmtime(storage.path(name)) < cutoff:
+                self.remove(name)
+                if not self.dry_run:
+                    storage.delete(name)
+                    delete_derivatives(name)
+                removed += 1
+
+        # Temporary files of uploads that died mid-stream
+        for name in self.files(storage, '.incoming'):
+            if os.path.getmtime(storage.path(name)) < cutoff:
+                self.remove(name)
+                if not self.dry_run:
+                    storage.delete(name)
+                removed += 1
+
+        for directory, filenames in self.stale_derivatives():
+            for filename in filenames:
+                name = posixpath.join(directory, filename)
+                self.remove(name)
+                if not self.dry_run:
+                    default_storage.delete(name)
+                removed += 1
+
+        verb = "Would delete" if self.dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} files."))
+
+    def remove(self, name):
+        self.stdout.write(f"{'would delete' if self.dry_run else 'deleted'} {name}")
+
+    def files(self, storage, prefix):
+        """Storage names of every file below `prefix`."""
+        root = storage.path(prefix)
+        for directory, _dirs, filenames in os.walk(root):
+            relative = os.path.relpath(directory, storage.location).replace(os.sep, '/')
+            for filename in filenames:
+                yield posixpath.join(relative, filename)
+
+    def stale_derivatives(self):
+        """(directory, filenames) of each variant directory whose original is gone.
+
+        Directories from the old layout, named after the original without its
+        extension, never match a file and are swept too.
+        """
+        root = default_storage.path(DERIVATIVE_ROOT)
+        for directory, _dirs, filenames in os.walk(root):
+            if not filenames:
+                continue
+            # derivatives/<original name>/<width>.<ext>
+            source = os.path.relpath(directory, root)
+            if not os.path.isfile(default_storage.path(source)):
+                name = os.path.relpath(directory, default_storage.location).replace(os.sep, '/')
+                yield name, filenames
@@ -0,0 +1,158 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .images import DERIVATIVE_ROOT
+from .storage import ContentAddressedStorage
+
+MEDIA_ACCEL = getattr(settings, 'MEDIA_ACCEL', None)
+MEDIA_ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/internal-media/')
+MEDIA_MAX_AGE = getattr(settings, 'MEDIA_MAX_AGE', 86400)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_PREFIXES = (
+    f'{ContentAddressedStorage.blob_prefix}/',
+    f'{DERIVATIVE_ROOT}/{ContentAddressedStorage.blob_prefix}/',
+)
+
+
+class FileRange:
+    """File-like view of bytes [start, start + length) of an open file.
+
+    Exposes fileno() with the descriptor already positioned at `start`, so a
+    WSGI server's file_wrapper (gunicorn) can sendfile() exactly the range
+    given by Content-Length; plain iteration reads no further than the range.
+    """
+
+    def __init__(self, fh, start, length):
+        self.fh = fh
+        self.remaining = length
+        fh.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fh.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.fh.fileno()
+
+    def close(self):
+        self.fh.close()
+
+
+def is_immutable(path):
+    """Content-addressed names (and their derivatives) never change in place."""
+    return path.startswith(IMMUTABLE_PREFIXES)
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single `bytes=` range, or None.
+
+    Raises ValueError for a syntactically valid but unsatisfiable range.
+    Multiple ranges are not supported and fall back to the full body.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def serve(request, path):
+    """Serve `path` from MEDIA_ROOT with validators, caching and byte ranges."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Invalid path")
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("File not found")
+    if not os.path.isfile(full_path):
+        raise Http404("File not found")
+
+    immutable = is_immutable(path)
+    etag = quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, full_path, path, stat.st_size, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+    if immutable:
+        patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=MEDIA_MAX_AGE)
+    return response
+
+
+def _file_response(request, full_path, path, size, etag):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if MEDIA_ACCEL:
+        # Let the front-end server do the transfer (and the Range handling)
+        response = HttpResponse(content_type=content_type)
+        if MEDIA_ACCEL == 'nginx':
+            # nginx percent-decodes the URI, so names with spaces, '%' or '?' must be encoded
+            response['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX + quote(path)
+        else:
+            response['X-Sendfile'] = full_path
+        return response
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if if_range is None or _if_range_matches(if_range, etag, full_path):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    fh = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(fh, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(FileRange(fh, start, end - start + 1), content_type=content_type, status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+def _if_range_matches(if_range, etag, full_path):
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    modified = parse_http_date_safe(if_range)
+    return modified is not None and int(os.path.getmtime(full_path)) <= modified
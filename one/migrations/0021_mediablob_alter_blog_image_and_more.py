@@ -0,0 +1,67 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:49
+
+import one.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('one', '0020_courseregistration_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Media Blob',
+                'verbose_name_plural': 'Media Blobs',
+            },
+        ),
+        migrations.AlterField(
+            model_name='blog',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=one.storage.get_content_addressed_storage, upload_to='blog_images/'),
+        ),
+        migrations.AlterField(
+            model_name='model',
+            name='chest_bust_size',
+            field=models.DecimalField(decimal_places=1, default=90.0, help_text='Chest/Bust in cm', max_digits=4),
+        ),
+        migrations.AlterField(
+            model_name='model',
+            name='chest_bust_type',
+            field=models.CharField(choices=[('C', 'Chest'), ('B', 'Bust')], default='C', max_length=1),
+        ),
+        migrations.AlterField(
+            model_name='modelapplication',
+            name='photo1',
+            field=models.ImageField(storage=one.storage.get_content_addressed_storage, upload_to='model_photos/', verbose_name='Photo #1*'),
+        ),
+        migrations.AlterField(
+            model_name='modelapplication',
+            name='photo2',
+            field=models.ImageField(storage=one.storage.get_content_addressed_storage, upload_to='model_photos/', verbose_name='Photo #2*'),
+        ),
+        migrations.AlterField(
+            model_name='modelapplication',
+            name='photo3',
+            field=models.ImageField(blank=True, null=True, storage=one.storage.get_content_addressed_storage, upload_to='model_photos/', verbose_name='Photo #3 (optional)'),
+        ),
+        migrations.AlterField(
+            model_name='modelimage',
+            name='image',
+            field=models.ImageField(storage=one.storage.get_content_addressed_storage, upload_to='models/slideshow/'),
+        ),
+        migrations.AlterField(
+            model_name='portfolio',
+            name='image',
+            field=models.ImageField(storage=one.storage.get_content_addressed_storage, upload_to='portfolio/'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    SiteCounter = apps.get_model('one', 'SiteCounter')
+    Model = apps.get_model('one', 'Model')
+    Booking = apps.get_model('one', 'Booking')
+    Client = apps.get_model('one', 'Client')
+    SiteCounter.objects.bulk_create([
+        SiteCounter(name='active_models', value=Model.objects.filter(status='active').count()),
+        SiteCounter(name='completed_bookings', value=Booking.objects.filter(status='completed').count()),
+        SiteCounter(name='clients', value=Client.objects.count()),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('one', '0022_model_profile_image_height_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Site Counter',
+                'verbose_name_plural': 'Site Counters',
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+import html
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+def create_blog_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Blog = apps.get_model('one', 'Blog')
+    rows = [
+        (blog.pk, blog.title, blog.summary, blog.meta_keywords,
+         ' '.join(html.unescape(strip_tags(blog.content or '')).split()))
+        for blog in Blog.objects.all()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS one_blog_fts USING fts5("
+            "title, summary, keywords, body, tokenize='porter unicode61 remove_diacritics 2')"
+        )
+        cursor.executemany(
+            "INSERT INTO one_blog_fts (rowid, title, summary, keywords, body) VALUES (%s, %s, %s, %s, %s)", rows
+        )
+
+
+def drop_blog_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS one_blog_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('one', '0023_sitecounter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_blog_fts, drop_blog_fts),
+    ]
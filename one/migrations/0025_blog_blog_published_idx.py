@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('one', '0024_blog_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['status', '-created_on', '-id'], name='blog_published_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('one', '0025_blog_blog_published_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='model',
+            index=models.Index(fields=['status', 'gender', 'height'], name='model_directory_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='model',
+            index=models.Index(fields=['status', 'name'], name='model_status_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='model',
+            index=models.Index(fields=['status', 'shoe_size'], name='model_status_shoe_idx'),
+        ),
+    ]
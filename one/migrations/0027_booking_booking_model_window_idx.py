@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('one', '0026_model_model_directory_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['model', 'start_date', 'end_date'], name='booking_model_window_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:15
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_clients(apps, schema_editor):
+    """Keep the oldest client per email and move the others' bookings to it."""
+    Client = apps.get_model('one', 'Client')
+    Booking = apps.get_model('one', 'Booking')
+    SiteCounter = apps.get_model('one', 'SiteCounter')
+    duplicates = Client.objects.values('email').annotate(keep=Min('pk'), rows=Count('pk')).filter(rows__gt=1)
+    for row in duplicates:
+        others = Client.objects.filter(email=row['email']).exclude(pk=row['keep'])
+        Booking.objects.filter(client__in=others).update(client_id=row['keep'])
+        others.delete()
+    SiteCounter.objects.filter(name='clients').update(value=Client.objects.count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('one', '0028_booking_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_clients, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='booking',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:22
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    for model_name in ('Portfolio', 'ModelImage'):
+        apps.get_model('one', model_name).objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('one', '0029_booking_idempotency_key_alter_client_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='modelimage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='portfolio',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
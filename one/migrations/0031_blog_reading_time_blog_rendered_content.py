@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+# Existing posts are backfilled by `manage.py render_blogs` (or on their first view),
+# so this migration doesn't depend on the current rendering code.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('one', '0030_modelimage_updated_at_portfolio_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=1, editable=False, help_text='Minutes'),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='rendered_content',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
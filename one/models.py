@@ -1,10 +1,16 @@
-from django.db import models
+from django.db import models, IntegrityError, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.core.validators import EmailValidator, MinLengthValidator
 from django.utils import timezone
 from django_ckeditor_5.fields import CKEditor5Field
 
+from .blogcontent import render_blog_content
+from .images import delete_derivatives
+from .pagecache import STATS_TAG, invalidate_tags
+from .storage import get_content_addressed_storage
+
 
 # -------------------------
 # Model for Modeling Agency
@@ -39,11 +45,22 @@ class Model(models.Model):
 
     bio = models.TextField(blank=True)
     profile_image = models.ImageField(upload_to='models/profiles/', blank=True)
+    profile_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    profile_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    profile_image_placeholder = models.TextField(blank=True, editable=False)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Model directory: filters, default ordering and the shoe size choices
+            models.Index(fields=['status', 'gender', 'height'], name='model_directory_idx'),
+            models.Index(fields=['status', 'name'], name='model_status_name_idx'),
+            models.Index(fields=['status', 'shoe_size'], name='model_status_shoe_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -69,12 +86,16 @@ class Portfolio(models.Model):
     model = models.ForeignKey(Model, on_delete=models.CASCADE, related_name='portfolio')
     title = models.CharField(max_length=100)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
-    image = models.ImageField(upload_to='portfolio/')
+    image = models.ImageField(upload_to='portfolio/', storage=get_content_addressed_storage)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
     description = models.TextField(blank=True)
     photographer = models.CharField(max_length=100, blank=True)
     shoot_date = models.DateField()
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.title} - {self.model.name}"
@@ -95,7 +116,7 @@ class Client(models.Model):
     client_type = models.CharField(max_length=15, choices=CLIENT_TYPE_CHOICES)
     company = models.CharField(max_length=100, blank=True)
     contact_person = models.CharField(max_length=100)
-    email = models.EmailField()
+    email = models.EmailField(unique=True)
     phone = models.CharField(max_length=15)
     address = models.TextField()
     website = models.URLField(blank=True)
@@ -104,6 +125,26 @@ class Client(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def upsert(cls, email, **defaults):
+        """Return (client id, created) for `email`, inserting the client if needed.
+
+        Existing clients are found with a plain read. Otherwise a single
+        INSERT ... ON CONFLICT (email) DO UPDATE ... RETURNING id resolves
+        concurrent requests for the same email to one row without raising.
+        Existing rows are never modified.
+        """
+        pk = cls.objects.filter(email=email).values_list('pk', flat=True).first()
+        if pk is not None:
+            return pk, False
+        client = cls(email=email, **defaults)
+        cls.objects.bulk_create([client], update_conflicts=True, unique_fields=['email'], update_fields=['email'])
+        # bulk_create sends no signals; only the request whose row was stored counts it
+        created = cls.objects.filter(pk=client.pk, created_at=client.created_at).exists()
+        if created:
+            SiteCounter.increment(SiteCounter.CLIENTS)
+        return client.pk, created
+
 
 # -------------------------
 # Booking Model
@@ -140,7 +181,17 @@ class Booking(models.Model):
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     email = models.EmailField(blank=True, null=True)
 
+    # Client-generated per form render; a retried submission hits the unique constraint
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Availability lookups and overlap checks per model
+            models.Index(fields=['model', 'start_date', 'end_date'], name='booking_model_window_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.model.name}"
@@ -163,9 +214,9 @@ class ModelApplication(models.Model):
     shoe = models.CharField("Shoe*", max_length=30, default="N/A")
     instagram = models.CharField("Instagram (username)", max_length=100, blank=True)
 
-    photo1 = models.ImageField("Photo #1*", upload_to="model_photos/")
-    photo2 = models.ImageField("Photo #2*", upload_to="model_photos/")
-    photo3 = models.ImageField("Photo #3 (optional)", upload_to="model_photos/", blank=True, null=True)
+    photo1 = models.ImageField("Photo #1*", upload_to="model_photos/", storage=get_content_addressed_storage)
+    photo2 = models.ImageField("Photo #2*", upload_to="model_photos/", storage=get_content_addressed_storage)
+    photo3 = models.ImageField("Photo #3 (optional)", upload_to="model_photos/", storage=get_content_addressed_storage, blank=True, null=True)
     data_policy = models.BooleanField("Privacy Policy*", default=False)
 
     def __str__(self):
@@ -184,9 +235,12 @@ class Blog(models.Model):
     title = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(max_length=200, unique=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="blog_posts")
-    image = models.ImageField(upload_to="blog_images/", blank=True, null=True)
+    image = models.ImageField(upload_to="blog_images/", storage=get_content_addressed_storage, blank=True, null=True)
     summary = models.CharField(max_length=300, blank=True)
     content = CKEditor5Field("Content", config_name="default")
+    # Derived from content on every save
+    rendered_content = models.TextField(blank=True, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=1, editable=False, help_text="Minutes")
     meta_title = models.CharField(max_length=200, blank=True)
     meta_description = models.CharField(max_length=160, blank=True)
     meta_keywords = models.CharField(max_length=250, blank=True)
@@ -195,9 +249,27 @@ class Blog(models.Model):
     status = models.IntegerField(choices=STATUS_CHOICES, default=0)
     views = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the published list walks this index in order
+            models.Index(fields=['status', '-created_on', '-id'], name='blog_published_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Saves of other fields only (e.g. status) leave the stored rendering alone
+        if update_fields is None or 'content' in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'rendered_content', 'reading_time'}
+        super().save(*args, **kwargs)
+
+    def render_content(self):
+        self.rendered_content, self.reading_time = render_blog_content(self.content)
+
 
 # -------------------------
 # Course Registration
@@ -309,10 +381,14 @@ class ContactForm(models.Model):
 # -------------------------
 class ModelImage(models.Model):
     model = models.ForeignKey(Model, on_delete=models.CASCADE, related_name='slideshow_images')
-    image = models.ImageField(upload_to='models/slideshow/')
+    image = models.ImageField(upload_to='models/slideshow/', storage=get_content_addressed_storage)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
     caption = models.CharField(max_length=200, blank=True)
     order = models.PositiveIntegerField(default=0, help_text="Order in slideshow")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['order', 'created_at']
@@ -321,3 +397,109 @@ class ModelImage(models.Model):
 
     def __str__(self):
         return f"{self.model.name} - Image {self.order + 1}"
+
+
+# -------------------------
+# Content-addressed media blobs
+# -------------------------
+class MediaBlob(models.Model):
+    """Reference count for a file stored by ContentAddressedStorage."""
+
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Media Blob"
+        verbose_name_plural = "Media Blobs"
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+    @classmethod
+    def acquire(cls, name):
+        if cls.objects.filter(name=name).update(refcount=F('refcount') + 1):
+            return
+        try:
+            cls.objects.create(name=name, refcount=1)
+        except IntegrityError:
+            cls.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+    @classmethod
+    def release(cls, name, storage):
+        """Drop one reference; delete the file once nothing points at it.
+
+        The file goes only after the transaction commits, and only if no
+        reference was taken in the meantime, so a rollback never leaves a
+        row pointing at a deleted blob. See the sweep_media command for
+        files whose saving transaction rolled back.
+        """
+        cls.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+        transaction.on_commit(lambda: cls._delete_unreferenced(name, storage))
+
+    @classmethod
+    def _delete_unreferenced(cls, name, storage):
+        deleted, _ = cls.objects.filter(name=name, refcount=0).delete()
+        if deleted:
+            storage.delete(name)
+            delete_derivatives(name)
+
+
+# -------------------------
+# Site statistics counters
+# -------------------------
+class SiteCounter(models.Model):
+    """Denormalised row counts for the home page, kept current by signals."""
+
+    ACTIVE_MODELS = 'active_models'
+    COMPLETED_BOOKINGS = 'completed_bookings'
+    CLIENTS = 'clients'
+
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Site Counter"
+        verbose_name_plural = "Site Counters"
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+    @classmethod
+    def sources(cls):
+        """The query each counter mirrors."""
+        return {
+            cls.ACTIVE_MODELS: Model.objects.filter(status='active'),
+            cls.COMPLETED_BOOKINGS: Booking.objects.filter(status='completed'),
+            cls.CLIENTS: Client.objects.all(),
+        }
+
+    @classmethod
+    def increment(cls, name, delta=1):
+        if not delta:
+            return
+        if cls.objects.filter(name=name).update(value=F('value') + delta, updated_at=timezone.now()):
+            invalidate_tags(STATS_TAG)
+            return
+        # First use of this counter: seed it from the source table, which already includes this change
+        cls.recount(names=[name])
+
+    @classmethod
+    def recount(cls, names=None):
+        """Recompute counters from their source tables; returns {name: value}."""
+        counts = {}
+        for name, queryset in cls.sources().items():
+            if names is not None and name not in names:
+                continue
+            counts[name] = queryset.count()
+            cls.objects.update_or_create(name=name, defaults={'value': counts[name]})
+        invalidate_tags(STATS_TAG)
+        return counts
+
+    @classmethod
+    def values(cls):
+        """All counters in one query, missing ones as 0."""
+        counts = dict.fromkeys(cls.sources(), 0)
+        counts.update(cls.objects.values_list('name', 'value'))
+        return counts
@@ -0,0 +1,171 @@
+import hashlib
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.template.loader import get_template, render_to_string
+from django.template.loader_tags import ExtendsNode, IncludeNode
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 7 * 24 * 60 * 60)
+# Stands in for the per-request CSRF token in cached output
+CSRF_PLACEHOLDER = 'csrf-token-placeholder-8d41f2c7'
+# Dependency tags: the active roster (lists, cards) and the home page counters
+ROSTER_TAG = 'roster'
+STATS_TAG = 'stats'
+
+
+def _template_sources(template_name, seen):
+    if template_name in seen:
+        return
+    seen.add(template_name)
+    template = get_template(template_name).template
+    yield template.source
+    for node in template.nodelist.get_nodes_by_type((ExtendsNode, IncludeNode)):
+        expression = node.parent_name if isinstance(node, ExtendsNode) else node.template
+        # Only constant names can be followed; dynamic ones are resolved at render time
+        if isinstance(getattr(expression, 'var', None), str):
+            yield from _template_sources(expression.var, seen)
+
+
+@lru_cache(maxsize=None)
+def template_fingerprint(template_name):
+    """Hash of the template, everything it extends or includes, and the static manifest.
+
+    Computed once per process, so a deploy (new code, templates or hashed
+    static file names) starts writing under new cache keys.
+    """
+    digest = hashlib.sha1()
+    for source in _template_sources(template_name, set()):
+        digest.update(source.encode())
+    digest.update(str(getattr(staticfiles_storage, 'manifest_hash', '')).encode())
+    return digest.hexdigest()[:16]
+
+
+def _cacheable(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Pending messages must be rendered (and consumed) by a real render; len() doesn't consume them
+    return not len(messages.get_messages(request))
+
+
+# -------------------------
+# Dependency tags
+# -------------------------
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+
+def tag_versions(tags):
+    """Current version of each tag; tags never seen (or evicted) get a fresh one."""
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A new version, never an old one: entries from before an eviction stay unreachable
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def model_tags(pk):
+    """Tags of a model's profile page: its own fields, portfolio and slideshow."""
+    return (f'model:{pk}', f'portfolio:{pk}', f'slideshow:{pk}')
+
+
+def invalidate_tags(*tags):
+    """Make every cached page that depends on any of `tags` unreachable.
+
+    Deferred until the current transaction commits (immediate outside
+    one): a page rendered from the old rows in between would otherwise be
+    cached under the new version and served stale until it expires.
+    """
+    def bump():
+        version = time.time_ns()
+        cache.set_many({_tag_key(tag): version for tag in tags}, None)
+    transaction.on_commit(bump)
+
+
+def tagged_get_or_set(key, compute, tags, timeout=PAGE_CACHE_TIMEOUT):
+    """cache.get_or_set() for a value derived from data covered by `tags`."""
+    versions = ':'.join(map(str, tag_versions(tags)))
+    return cache.get_or_set(f'{key}:{versions}', compute, timeout)
+
+
+# -------------------------
+# Cached rendering
+# -------------------------
+def cached_render(request, template_name, get_context, variant='', tags=(), timeout=PAGE_CACHE_TIMEOUT):
+    """Render `template_name`, from the page cache when possible.
+
+    `get_context` is only called on a miss, so a hit runs no queries.
+    Anonymous GETs are cached under the path, `variant` (for example the
+    query string), template_fingerprint() and the current version of each
+    dependency tag; invalidate_tags() retires exactly the entries that
+    depend on a tag. Cached output is rendered with a CSRF placeholder
+    (swapped for this request's token on the way out) and no messages;
+    requests with pending messages or a logged-in user get a normal render.
+    """
+    if not _cacheable(request):
+        return render(request, template_name, get_context())
+
+    identity = '\n'.join([request.path, variant, *map(str, tags), *map(str, tag_versions(tags))])
+    key = f'page:{template_fingerprint(template_name)}:{hashlib.sha1(identity.encode()).hexdigest()}'
+    # get_or_set() lets the cache backend coalesce concurrent misses
+    content = cache.get_or_set(key, lambda: render_to_string(
+        template_name, {**get_context(), 'csrf_token': CSRF_PLACEHOLDER, 'messages': ()}, request,
+    ), timeout)
+    if CSRF_PLACEHOLDER in content:
+        content = content.replace(CSRF_PLACEHOLDER, get_token(request))
+    return HttpResponse(content)
+
+
+def render_cached(request, template_name, context=None):
+    """Full-page cache for pages whose output only changes between deploys."""
+    return cached_render(request, template_name, lambda: context or {})
+
+
+# -------------------------
+# Conditional GET
+# -------------------------
+def _template_first_seen(fingerprint):
+    # Shared through the cache, so every worker reports the same deploy time
+    return cache.get_or_set(f'template-seen:{fingerprint}', lambda: int(time.time()), None)
+
+
+def conditional_render(request, template_name, version, last_modified, respond):
+    """Answer If-None-Match / If-Modified-Since with 304 before rendering.
+
+    `version` and `last_modified` describe the data behind the page (see
+    one.queries); the ETag also covers template_fingerprint(), and
+    Last-Modified is never older than the first time this build of the
+    templates was seen, so a deploy invalidates copies held by clients.
+    `respond()` produces the full response and is only called when the
+    client's copy is stale. Requests that would not be page-cached (pending
+    messages, logged-in users) always get a full response.
+    """
+    if not _cacheable(request):
+        return respond()
+
+    fingerprint = template_fingerprint(template_name)
+    etag = quote_etag(hashlib.sha1(f'{fingerprint}:{version}'.encode()).hexdigest())
+    last_modified = max(int(last_modified.timestamp()), _template_first_seen(fingerprint))
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = respond()
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Pages embed a CSRF token, so only the browser may keep them, and it must revalidate
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,87 @@
+from django.db.models import Count, Max, OuterRef, Prefetch, Q, Subquery
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from .models import Model, Portfolio, ModelImage, Blog
+
+PROFILE_PORTFOLIO_LIMIT = 24
+PROFILE_SLIDESHOW_LIMIT = 4
+RECENT_POSTS_LIMIT = 3
+
+
+def load_model_profile(pk):
+    """Fetch a model with its latest portfolio items and slideshow in three queries.
+
+    The related rows are attached as plain lists: ``model.portfolio_items``
+    (newest first, at most PROFILE_PORTFOLIO_LIMIT) and
+    ``model.slideshow`` (slideshow order, at most PROFILE_SLIDESHOW_LIMIT),
+    so templates can iterate them any number of times without hitting the
+    database again.
+    """
+    queryset = Model.objects.prefetch_related(
+        Prefetch(
+            'portfolio',
+            queryset=Portfolio.objects.order_by('-created_at')[:PROFILE_PORTFOLIO_LIMIT],
+            to_attr='portfolio_items',
+        ),
+        Prefetch(
+            'slideshow_images',
+            queryset=ModelImage.objects.order_by('order', 'created_at')[:PROFILE_SLIDESHOW_LIMIT],
+            to_attr='slideshow',
+        ),
+    )
+    return get_object_or_404(queryset, pk=pk)
+
+
+# -------------------------
+# Page validators
+# -------------------------
+def _related_stats(model_class):
+    """Subqueries for the newest change and row count of a model's related rows."""
+    rows = model_class.objects.filter(model=OuterRef('pk')).order_by().values('model')
+    return (
+        Subquery(rows.annotate(newest=Max('updated_at')).values('newest')),
+        Subquery(rows.annotate(count=Count('pk')).values('count')),
+    )
+
+
+def model_profile_version(pk):
+    """(version, last_modified) of a model's profile page, from one query.
+
+    The version covers the model row and the newest change and row count of
+    its portfolio and slideshow, so edits, uploads and deletions all change
+    it. Deleting or moving a related row touches the model (one.signals), so
+    Last-Modified moves forward too. Raises Http404 like load_model_profile().
+    """
+    portfolio_changed, portfolio_count = _related_stats(Portfolio)
+    slideshow_changed, slideshow_count = _related_stats(ModelImage)
+    row = Model.objects.filter(pk=pk).values_list(
+        'updated_at', portfolio_changed, slideshow_changed, portfolio_count, slideshow_count,
+    ).first()
+    if row is None:
+        raise Http404("No Model matches the given query.")
+    last_modified = max(changed for changed in row[:3] if changed is not None)
+    return repr(row), last_modified
+
+
+def blog_post_version(slug):
+    """(version, last_modified) of a published post's page, from one query.
+
+    Covers the post and the "recent posts" sidebar (the newest other posts).
+    The view counter is deliberately left out: it is written with update()
+    and would make every request a miss. Deleting or unpublishing a post
+    touches the newest others (one.signals), so Last-Modified never goes
+    backwards. Raises Http404 for unknown or unpublished posts.
+    """
+    published = Blog.objects.filter(status=1)
+    newest = published.order_by('-created_on').values('pk')[:RECENT_POSTS_LIMIT + 1]
+    rows = list(
+        published.filter(Q(slug=slug) | Q(pk__in=newest))
+        .order_by('-created_on')
+        .values_list('pk', 'slug', 'updated_on')
+    )
+    post = next((row for row in rows if row[1] == slug), None)
+    if post is None:
+        raise Http404("No Blog matches the given query.")
+    recent = [row for row in rows if row is not post][:RECENT_POSTS_LIMIT]
+    return repr([post, *recent]), max(row[2] for row in [post, *recent])
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import tempfile
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from filelock import FileLock, Timeout
+from PIL import Image, ImageOps
+
+from .images import flatten_to_rgb
+
+RESIZE_CACHE_DIR = getattr(settings, 'RESIZE_CACHE_DIR', settings.BASE_DIR / 'cache' / 'resized')
+RESIZE_CACHE_MAX_BYTES = getattr(settings, 'RESIZE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+# (width, height) pairs the endpoint renders, 0 = unconstrained; anything else is a 404,
+# so the cache cannot be filled with arbitrary sizes
+RESIZE_SIZES = frozenset(getattr(settings, 'RESIZE_SIZES', [
+    (width, 0) for width in (320, 480, 640, 960, 1280, 1440, 1920)
+]))
+RESIZABLE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+OUTPUT_FORMATS = {
+    'webp': ('image/webp', {'format': 'WEBP', 'quality': 78, 'method': 4}),
+    'jpg': ('image/jpeg', {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+
+class ResizeError(Exception):
+    """The requested resize cannot be served (bad size, path or source)."""
+
+
+# -------------------------
+# Cache layout
+# -------------------------
+def source_path(path):
+    """Resolve `path` under MEDIA_ROOT, refusing anything outside it."""
+    if not path.lower().endswith(RESIZABLE_EXTENSIONS):
+        raise ResizeError("Not a resizable image")
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise ResizeError("Invalid path")
+    if not os.path.isfile(full_path):
+        raise ResizeError("Source image not found")
+    return full_path
+
+
+def cache_path(full_path, width, height, ext):
+    """Location of the cached variant.
+
+    The source mtime and size are part of the key, so replacing a file under
+    the same name yields a new entry and the stale one ages out of the LRU.
+    """
+    stat = os.stat(full_path)
+    raw = f'{full_path}|{width}x{height}|{ext}|{stat.st_mtime_ns}|{stat.st_size}'
+    key = hashlib.sha1(raw.encode()).hexdigest()
+    return os.path.join(RESIZE_CACHE_DIR, key[:2], f'{key}.{ext}')
+
+
+def _touch(path):
+    """Mark a cache entry as recently used; mtime doubles as the LRU clock."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+# -------------------------
+# Resize + store
+# -------------------------
+def _render(full_path, width, height, ext):
+    with Image.open(full_path) as original:
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((width or image.width, height or image.height), Image.LANCZOS, reducing_gap=3.0)
+        if ext == 'jpg' or image.mode not in ('RGB', 'RGBA'):
+            image = flatten_to_rgb(image)
+        buffer = BytesIO()
+        image.save(buffer, **OUTPUT_FORMATS[ext][1])
+    return buffer.getvalue()
+
+
+def _write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# Bytes this process has written since its last eviction pass. Starts full so
+# the first write after a restart checks the cache size.
+_unevicted_bytes = RESIZE_CACHE_MAX_BYTES
+_unevicted_lock = threading.Lock()
+
+
+def _note_written(size):
+    """Run an eviction pass once every ~5% of the cap written by this process."""
+    global _unevicted_bytes
+    with _unevicted_lock:
+        _unevicted_bytes += size
+        due = _unevicted_bytes >= RESIZE_CACHE_MAX_BYTES * 0.05
+        if due:
+            _unevicted_bytes = 0
+    if due:
+        evict()
+
+
+def evict(max_bytes=None):
+    """Drop least recently used entries until the cache fits in `max_bytes`.
+
+    Trims down to 90% of the cap so a burst of misses does not trigger an
+    eviction pass on every write. Only one process evicts at a time; others
+    skip the pass instead of waiting.
+    """
+    max_bytes = RESIZE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    os.makedirs(RESIZE_CACHE_DIR, exist_ok=True)
+    try:
+        with FileLock(os.path.join(RESIZE_CACHE_DIR, '.evict.lock'), timeout=0):
+            entries = []
+            total = 0
+            for shard in os.scandir(RESIZE_CACHE_DIR):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(('.lock', '.tmp')):
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total <= max_bytes:
+                return
+            target = max_bytes * 0.9
+            for _mtime, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+    except Timeout:
+        pass
+
+
+def get_resized(path, width, height, ext='jpg'):
+    """Return (open file, content type) for `path` resized to fit width x height.
+
+    Only sizes in RESIZE_SIZES are served. Cache hits are an open and a utime;
+    Pillow is only touched on a miss, and concurrent misses for the same key
+    wait on one lock so the source is decoded once. A zero width or height
+    leaves that side unconstrained. The caller closes the file.
+    """
+    if (width, height) not in RESIZE_SIZES:
+        raise ResizeError("Unsupported size")
+    full_path = source_path(path)
+    target = cache_path(full_path, width, height, ext)
+    content_type = OUTPUT_FORMATS[ext][0]
+
+    # Opening first means an entry evicted after a stat can't turn into a 500
+    try:
+        fh = open(target, 'rb')
+    except FileNotFoundError:
+        pass
+    else:
+        _touch(target)
+        return fh, content_type
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    written = 0
+    with FileLock(f'{target}.lock'):
+        try:
+            # Rendered by another worker while this one waited for the lock
+            fh = open(target, 'rb')
+        except FileNotFoundError:
+            try:
+                data = _render(full_path, width, height, ext)
+            except (OSError, Image.DecompressionBombError) as exc:
+                raise ResizeError(str(exc))
+            _write_atomic(target, data)
+            written = len(data)
+            # Serve the bytes in hand; the cached copy may be evicted at any moment
+            fh = BytesIO(data)
+    try:
+        os.unlink(f'{target}.lock')
+    except OSError:
+        pass
+
+    if written:
+        _note_written(written)
+    return fh, content_type
@@ -0,0 +1,120 @@
+import html
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import mark_safe
+
+FTS_TABLE = 'one_blog_fts'
+FTS_COLUMNS = ('title', 'summary', 'keywords', 'body')
+# bm25 column weights, in FTS_COLUMNS order: a title hit outranks a body hit
+FTS_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+SNIPPET_TOKENS = 24
+# Control characters can't occur in the indexed text, so they survive escaping as markers
+MATCH_START, MATCH_END = '\x02', '\x03'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def create_index_sql():
+    columns = ', '.join(FTS_COLUMNS)
+    return f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({columns}, tokenize='porter unicode61 remove_diacritics 2')"
+
+
+def plain_text(value):
+    """Index text for a CKEditor HTML field: tags stripped, entities decoded."""
+    return ' '.join(html.unescape(strip_tags(value or '')).split())
+
+
+def index_row(blog):
+    return (blog.pk, blog.title, blog.summary, blog.meta_keywords, plain_text(blog.content))
+
+
+# -------------------------
+# Keeping the index in sync
+# -------------------------
+def index_blogs(blogs):
+    rows = [index_row(blog) for blog in blogs]
+    if not rows or not fts_available():
+        return
+    placeholders = ', '.join(['%s'] * (len(FTS_COLUMNS) + 1))
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) VALUES ({placeholders})", rows
+        )
+
+
+def remove_blog(pk):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def rebuild_index(queryset):
+    """Drop and refill the whole index; returns the number of indexed posts."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        cursor.execute(create_index_sql())
+    count = 0
+    batch = []
+    for blog in queryset.iterator(chunk_size=200):
+        batch.append(blog)
+        if len(batch) == 200:
+            index_blogs(batch)
+            count += len(batch)
+            batch = []
+    index_blogs(batch)
+    return count + len(batch)
+
+
+# -------------------------
+# Querying
+# -------------------------
+def match_expression(query):
+    """Turn free text into a safe FTS5 query: every word must match, as a prefix."""
+    tokens = TOKEN_RE.findall(query)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search(queryset, query):
+    """Filter `queryset` (of Blog) to posts matching `query`.
+
+    Rows are annotated with ``rank`` (bm25, lower is better) and ``snippet``
+    and ordered by relevance. Without FTS5 this falls back to icontains on
+    the text fields, ordered by id, with an empty snippet.
+    """
+    expression = match_expression(query)
+    if not expression or not fts_available():
+        queryset = queryset.annotate(rank=RawSQL('0', []), snippet=RawSQL("''", []))
+        if not expression:
+            return queryset.none()
+        return queryset.filter(
+            Q(title__icontains=query) | Q(summary__icontains=query) | Q(content__icontains=query)
+        ).order_by('id')
+
+    table = queryset.model._meta.db_table
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[expression],
+    ).annotate(
+        rank=RawSQL(f'bm25({FTS_TABLE}, {weights})', []),
+        snippet=RawSQL(
+            f"snippet({FTS_TABLE}, -1, %s, %s, %s, %s)",
+            [MATCH_START, MATCH_END, '…', SNIPPET_TOKENS],
+        ),
+    ).order_by('rank', 'id')
+
+
+def highlight(snippet):
+    """Render an FTS snippet as HTML with matches wrapped in <mark>."""
+    return mark_safe(escape(snippet).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>'))
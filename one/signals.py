@@ -0,0 +1,366 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import ical, search
+from .availability import availability_cache
+from .casting import casting_index
+from .images import delete_derivatives, ensure_derivatives, image_metadata
+from .models import Model, Portfolio, ModelImage, Blog, ModelApplication, MediaBlob, Booking, Client, SiteCounter
+from .pagecache import ROSTER_TAG, invalidate_tags
+from .queries import RECENT_POSTS_LIMIT
+from .storage import content_addressed_storage
+from .tasks import run_in_background
+
+
+# -------------------------
+# Previous values
+# -------------------------
+# Stored fields the receivers below compare against, read once per save
+SNAPSHOT_FIELDS = {
+    Model: ('profile_image', 'status'),
+    Portfolio: ('image', 'model_id'),
+    ModelImage: ('image', 'model_id'),
+    Blog: ('image', 'status'),
+    ModelApplication: ('photo1', 'photo2', 'photo3'),
+    Booking: ('status',),
+}
+
+
+# Connected before every other pre_save receiver here, so they can use it too
+@receiver(pre_save, sender=Model)
+@receiver(pre_save, sender=Portfolio)
+@receiver(pre_save, sender=ModelImage)
+@receiver(pre_save, sender=Blog)
+@receiver(pre_save, sender=ModelApplication)
+@receiver(pre_save, sender=Booking)
+def remember_previous_values(sender, instance, raw=False, **kwargs):
+    previous = None
+    if instance.pk and not raw:
+        previous = sender.objects.filter(pk=instance.pk).values_list(*SNAPSHOT_FIELDS[sender]).first()
+    instance._previous_values = dict(zip(SNAPSHOT_FIELDS[sender], previous or ()))
+
+
+def previous_value(instance, field_name):
+    """The stored value of `field_name` before the current save; None for new rows."""
+    return getattr(instance, '_previous_values', {}).get(field_name)
+
+
+# -------------------------
+# Responsive image derivatives
+# -------------------------
+RESPONSIVE_IMAGE_FIELDS = {
+    Model: ('profile_image',),
+    Portfolio: ('image',),
+    ModelImage: ('image',),
+    Blog: ('image',),
+}
+
+
+@receiver(post_save, sender=Model)
+@receiver(post_save, sender=Portfolio)
+@receiver(post_save, sender=ModelImage)
+@receiver(post_save, sender=Blog)
+def build_image_derivatives(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    for field_name in RESPONSIVE_IMAGE_FIELDS[sender]:
+        ensure_derivatives(getattr(instance, field_name))
+
+
+def _drop_derivatives(names):
+    # Blobs may be shared; theirs go when the last reference is released (MediaBlob.release)
+    for name in names:
+        if name and not content_addressed_storage.is_blob(name):
+            transaction.on_commit(lambda name=name: delete_derivatives(name))
+
+
+@receiver(post_save, sender=Model)
+@receiver(post_save, sender=Portfolio)
+@receiver(post_save, sender=ModelImage)
+@receiver(post_save, sender=Blog)
+def drop_replaced_derivatives(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    fields = RESPONSIVE_IMAGE_FIELDS[sender]
+    previous = {previous_value(instance, field_name) for field_name in fields}
+    _drop_derivatives(previous - {getattr(instance, field_name).name for field_name in fields})
+
+
+@receiver(post_delete, sender=Model)
+@receiver(post_delete, sender=Portfolio)
+@receiver(post_delete, sender=ModelImage)
+@receiver(post_delete, sender=Blog)
+def drop_deleted_derivatives(sender, instance, **kwargs):
+    _drop_derivatives(getattr(instance, field_name).name for field_name in RESPONSIVE_IMAGE_FIELDS[sender])
+
+
+# -------------------------
+# Intrinsic size and low-quality placeholders
+# -------------------------
+IMAGE_METADATA_FIELDS = {
+    Model: 'profile_image',
+    Portfolio: 'image',
+    ModelImage: 'image',
+}
+
+
+def _clear_image_metadata(instance, field_name):
+    setattr(instance, f'{field_name}_width', None)
+    setattr(instance, f'{field_name}_height', None)
+    setattr(instance, f'{field_name}_placeholder', '')
+
+
+def store_image_metadata(model_class, pk, field_name, name):
+    field_file = getattr(model_class(pk=pk, **{field_name: name}), field_name)
+    width, height, placeholder = image_metadata(field_file)
+    # Only write if the image was not replaced while we were working
+    updated = model_class.objects.filter(pk=pk, **{field_name: name}).update(**{
+        f'{field_name}_width': width,
+        f'{field_name}_height': height,
+        f'{field_name}_placeholder': placeholder,
+        # update() skips auto_now; the page's validators depend on it
+        'updated_at': timezone.now(),
+    })
+    if updated:
+        # update() sends no signals, and cached pages still have the old markup
+        owner_id = model_class.objects.filter(pk=pk).values_list(PAGE_OWNER_FIELDS[model_class], flat=True).first()
+        invalidate_pages(model_class, owner_id)
+
+
+@receiver(pre_save, sender=Model)
+@receiver(pre_save, sender=Portfolio)
+@receiver(pre_save, sender=ModelImage)
+def reset_stale_image_metadata(sender, instance, raw=False, **kwargs):
+    field_name = IMAGE_METADATA_FIELDS[sender]
+    if raw or not instance.pk:
+        return
+    if previous_value(instance, field_name) != getattr(instance, field_name).name:
+        _clear_image_metadata(instance, field_name)
+
+
+@receiver(post_save, sender=Model)
+@receiver(post_save, sender=Portfolio)
+@receiver(post_save, sender=ModelImage)
+def schedule_image_metadata(sender, instance, raw=False, **kwargs):
+    field_name = IMAGE_METADATA_FIELDS[sender]
+    field_file = getattr(instance, field_name)
+    if raw or not field_file or getattr(instance, f'{field_name}_placeholder'):
+        return
+    run_in_background(store_image_metadata, sender, instance.pk, field_name, field_file.name)
+
+
+# -------------------------
+# Content-addressed blob reference counts
+# -------------------------
+CONTENT_ADDRESSED_FIELDS = {
+    ModelApplication: ('photo1', 'photo2', 'photo3'),
+    Portfolio: ('image',),
+    ModelImage: ('image',),
+    Blog: ('image',),
+}
+
+
+def _blob_names(names):
+    return Counter(name for name in names if content_addressed_storage.is_blob(name))
+
+
+@receiver(post_save, sender=ModelApplication)
+@receiver(post_save, sender=Portfolio)
+@receiver(post_save, sender=ModelImage)
+@receiver(post_save, sender=Blog)
+def update_blob_references(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = _blob_names(previous_value(instance, field) for field in CONTENT_ADDRESSED_FIELDS[sender])
+    current = _blob_names(getattr(instance, field).name for field in CONTENT_ADDRESSED_FIELDS[sender])
+    for name, count in (current - previous).items():
+        for _ in range(count):
+            MediaBlob.acquire(name)
+    for name, count in (previous - current).items():
+        for _ in range(count):
+            MediaBlob.release(name, content_addressed_storage)
+
+
+@receiver(post_delete, sender=ModelApplication)
+@receiver(post_delete, sender=Portfolio)
+@receiver(post_delete, sender=ModelImage)
+@receiver(post_delete, sender=Blog)
+def release_blob_references(sender, instance, **kwargs):
+    current = _blob_names(getattr(instance, field).name for field in CONTENT_ADDRESSED_FIELDS[sender])
+    for name, count in current.items():
+        for _ in range(count):
+            MediaBlob.release(name, content_addressed_storage)
+
+
+# -------------------------
+# Home page statistics counters
+# -------------------------
+COUNTED_STATUSES = {
+    Model: (SiteCounter.ACTIVE_MODELS, 'active'),
+    Booking: (SiteCounter.COMPLETED_BOOKINGS, 'completed'),
+}
+
+
+@receiver(post_save, sender=Model)
+@receiver(post_save, sender=Booking)
+def update_status_counter(sender, instance, raw=False, **kwargs):
+    # Fixtures carry their own counter rows; run `recount` after loading others
+    if raw:
+        return
+    name, counted = COUNTED_STATUSES[sender]
+    was_counted = previous_value(instance, 'status') == counted
+    is_counted = instance.status == counted
+    SiteCounter.increment(name, int(is_counted) - int(was_counted))
+
+
+@receiver(post_delete, sender=Model)
+@receiver(post_delete, sender=Booking)
+def release_status_counter(sender, instance, **kwargs):
+    name, counted = COUNTED_STATUSES[sender]
+    if instance.status == counted:
+        SiteCounter.increment(name, -1)
+
+
+@receiver(post_save, sender=Client)
+def count_new_client(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        SiteCounter.increment(SiteCounter.CLIENTS)
+
+
+@receiver(post_delete, sender=Client)
+def count_deleted_client(sender, instance, **kwargs):
+    SiteCounter.increment(SiteCounter.CLIENTS, -1)
+
+
+# -------------------------
+# Blog full-text index
+# -------------------------
+@receiver(post_save, sender=Blog)
+def index_blog(sender, instance, **kwargs):
+    search.index_blogs([instance])
+
+
+@receiver(post_delete, sender=Blog)
+def unindex_blog(sender, instance, **kwargs):
+    search.remove_blog(instance.pk)
+
+
+# -------------------------
+# Casting search index
+# -------------------------
+@receiver(post_save, sender=Model)
+def update_casting_index(sender, instance, **kwargs):
+    casting_index.update(instance)
+
+
+@receiver(post_delete, sender=Model)
+def remove_from_casting_index(sender, instance, **kwargs):
+    casting_index.remove(instance.pk)
+
+
+# -------------------------
+# Model availability
+# -------------------------
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_availability(sender, instance, **kwargs):
+    availability_cache.invalidate(instance.model_id)
+
+
+# -------------------------
+# Model calendar feeds
+# -------------------------
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_booking_calendar(sender, instance, **kwargs):
+    ical.invalidate(instance.model_id)
+
+
+@receiver(post_save, sender=Model)
+@receiver(post_delete, sender=Model)
+def invalidate_model_calendar(sender, instance, **kwargs):
+    ical.invalidate(instance.pk)
+
+
+# -------------------------
+# Page cache dependencies
+# -------------------------
+# The model whose pages show each row, and the tags those pages carry for it
+PAGE_OWNER_FIELDS = {
+    Model: 'pk',
+    Portfolio: 'model_id',
+    ModelImage: 'model_id',
+}
+PAGE_TAGS = {
+    Model: lambda owner_id: (f'model:{owner_id}', ROSTER_TAG),
+    Portfolio: lambda owner_id: (f'portfolio:{owner_id}',),
+    ModelImage: lambda owner_id: (f'slideshow:{owner_id}',),
+}
+
+
+def invalidate_pages(sender, *owner_ids):
+    tags = {tag for owner_id in owner_ids if owner_id is not None for tag in PAGE_TAGS[sender](owner_id)}
+    if tags:
+        invalidate_tags(*tags)
+
+
+@receiver(post_save, sender=Model)
+@receiver(post_save, sender=Portfolio)
+@receiver(post_save, sender=ModelImage)
+def invalidate_saved_pages(sender, instance, **kwargs):
+    owner_id = getattr(instance, PAGE_OWNER_FIELDS[sender])
+    # A row moved to another model leaves that model's page too
+    invalidate_pages(sender, owner_id, previous_value(instance, 'model_id'))
+
+
+@receiver(post_delete, sender=Model)
+@receiver(post_delete, sender=Portfolio)
+@receiver(post_delete, sender=ModelImage)
+def invalidate_deleted_pages(sender, instance, **kwargs):
+    invalidate_pages(sender, getattr(instance, PAGE_OWNER_FIELDS[sender]))
+
+
+# -------------------------
+# Page validators
+# -------------------------
+# A page's Last-Modified is the newest change among the rows it shows (see
+# one.queries), so a row leaving a page has to move it forward explicitly.
+def touch_models(*pks):
+    Model.objects.filter(pk__in=[pk for pk in pks if pk is not None]).update(updated_at=timezone.now())
+
+
+def touch_recent_posts():
+    # Every post page's sidebar is drawn from these; update() leaves the search index alone
+    newest = Blog.objects.filter(status=1).order_by('-created_on').values('pk')[:RECENT_POSTS_LIMIT + 1]
+    Blog.objects.filter(pk__in=newest).update(updated_on=timezone.now())
+
+
+@receiver(post_save, sender=Portfolio)
+@receiver(post_save, sender=ModelImage)
+def touch_previous_owner(sender, instance, raw=False, **kwargs):
+    previous = previous_value(instance, 'model_id')
+    if not raw and previous != instance.model_id:
+        touch_models(previous)
+
+
+@receiver(post_delete, sender=Portfolio)
+@receiver(post_delete, sender=ModelImage)
+@receiver(post_delete, sender=Booking)
+def touch_owner_of_deleted_row(sender, instance, **kwargs):
+    touch_models(instance.model_id)
+
+
+@receiver(post_save, sender=Blog)
+def touch_posts_after_unpublishing(sender, instance, raw=False, **kwargs):
+    if not raw and previous_value(instance, 'status') == 1 and instance.status != 1:
+        touch_recent_posts()
+
+
+@receiver(post_delete, sender=Blog)
+def touch_posts_after_deletion(sender, instance, **kwargs):
+    if instance.status == 1:
+        touch_recent_posts()
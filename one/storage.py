@@ -0,0 +1,88 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Media storage that keeps each distinct upload exactly once.
+
+    Uploads are hashed (SHA-256) while they are streamed to a temporary file,
+    then moved to ``blobs/<aa>/<bb>/<digest><ext>``. A second upload with the
+    same bytes resolves to the same name and costs no extra disk. The name
+    passed in by ``upload_to`` only contributes its extension.
+
+    Files stored before this backend existed keep their original names and
+    are served as usual; only names under ``blobs/`` are content addressed.
+    """
+
+    blob_prefix = 'blobs'
+
+    def blob_name(self, digest, ext):
+        return posixpath.join(self.blob_prefix, digest[:2], digest[2:4], f'{digest}{ext}')
+
+    def is_blob(self, name):
+        return bool(name) and name.startswith(f'{self.blob_prefix}/')
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save(); identical
+        # content must map to the same name instead of getting a suffix.
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()
+        incoming = os.path.join(self.location, '.incoming')
+        os.makedirs(incoming, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    fh.write(chunk)
+
+            name = self.blob_name(digest.hexdigest(), ext)
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+                os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return name
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def get_content_addressed_storage():
+    """Field `storage=` callable, so migrations reference it by path."""
+    return content_addressed_storage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Hashed, compressed static files that tolerate references to missing files.
+
+    The manifest storage raises ValueError (a 500) from {% static %} for any
+    name that collectstatic did not see, such as a hero video that is
+    deployed separately. Such names fall back to their unhashed URL, which
+    404s like it would without the manifest.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
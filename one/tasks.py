@@ -0,0 +1,27 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='one-background')
+
+
+def _run(func, args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Background task %s failed", func.__name__)
+    finally:
+        # Each worker thread holds its own connection; don't leak it between tasks
+        connection.close()
+
+
+def run_in_background(func, *args):
+    """Run `func(*args)` on a worker thread once the current transaction commits.
+
+    For small post-save jobs (image metadata and the like) that should not
+    hold up the request. Jobs are best effort: they do not survive a restart.
+    """
+    transaction.on_commit(lambda: _executor.submit(_run, func, args))
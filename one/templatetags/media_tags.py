@@ -0,0 +1,109 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+
+from one.images import available_derivatives, derivative_name
+from one.resize import RESIZE_SIZES
+from one.video import RENDITIONS, poster_name, rendition_name, static_exists
+
+register = template.Library()
+
+
+def _srcset(storage, name, widths, ext):
+    return ', '.join(
+        f'{storage.url(derivative_name(name, width, ext))} {width}w' for width in widths
+    )
+
+
+@register.simple_tag
+def responsive_image(field_file, sizes='100vw', **attrs):
+    """Render `field_file` as a <picture> built from its resized variants.
+
+    Usage: {% responsive_image model.profile_image sizes="(max-width: 768px) 100vw, 50vw" class="model-image" alt=model.name %}
+
+    Falls back to a plain <img> pointing at the original when no variants
+    have been generated yet. When the model stores `<field>_width`,
+    `<field>_height` and `<field>_placeholder`, the <img> gets its intrinsic
+    size (so layout is reserved) and a blurred placeholder background.
+    """
+    if not field_file:
+        return ''
+
+    # Intrinsic size and placeholder, for models that store <field>_width etc.
+    instance, field_name = field_file.instance, field_file.field.name
+    width = getattr(instance, f'{field_name}_width', None)
+    height = getattr(instance, f'{field_name}_height', None)
+    placeholder = getattr(instance, f'{field_name}_placeholder', '')
+    if width and height:
+        attrs = {'width': width, 'height': height, **attrs}
+    if placeholder:
+        background = f"background:url('{placeholder}') center/cover no-repeat"
+        attrs['style'] = f"{background}; {attrs['style']}" if attrs.get('style') else background
+
+    extra = format_html_join('', ' {}="{}"', attrs.items())
+    variants = available_derivatives(field_file)
+    if 'jpg' not in variants:
+        return format_html('<img src="{}"{}>', field_file.url, extra)
+
+    storage, name = default_storage, field_file.name
+    jpg_widths = variants['jpg']
+    fallback = storage.url(derivative_name(name, jpg_widths[-1], 'jpg'))
+
+    webp_source = ''
+    if 'webp' in variants:
+        webp_source = format_html(
+            '<source type="image/webp" srcset="{}" sizes="{}">',
+            _srcset(storage, name, variants['webp'], 'webp'), sizes,
+        )
+
+    return format_html(
+        '<picture class="responsive-picture">{}<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        webp_source, fallback, _srcset(storage, name, jpg_widths, 'jpg'), sizes, extra,
+    )
+
+
+@register.filter
+def resized(field_file, size):
+    """URL of `field_file` resized on demand to fit `size` ("WxH", 0 = auto).
+
+    Usage: <img src="{{ model.profile_image|resized:'640x0' }}">
+
+    Sizes missing from RESIZE_SIZES fall back to the original file.
+    """
+    if not field_file:
+        return ''
+    width, _x, height = size.partition('x')
+    width, height = int(width or 0), int(height or 0)
+    if (width, height) not in RESIZE_SIZES:
+        return field_file.url
+    return reverse('resized-media', kwargs={'width': width, 'height': height, 'path': field_file.name})
+
+
+@register.simple_tag
+def hero_video(path, **attrs):
+    """Render a muted, looping, autoplaying <video> for the static file `path`.
+
+    Usage: {% hero_video 'images/ntavid.mp4' class="bg-video" %}
+
+    Emits one <source media> per WebM rendition built by
+    build_video_renditions, smallest viewport first, then the original MP4
+    for large screens and browsers without WebM. The poster frame is shown
+    until playback starts.
+    """
+    poster = poster_name(path)
+    if static_exists(poster):
+        attrs = {'poster': static(poster), **attrs}
+    extra = format_html_join('', ' {}="{}"', attrs.items())
+
+    sources = format_html_join('', '<source src="{}" type="video/webm" media="{}">', (
+        (static(rendition_name(path, height)), media)
+        for height, media in RENDITIONS
+        if static_exists(rendition_name(path, height))
+    ))
+    return format_html(
+        '<video autoplay muted loop playsinline{}>{}<source src="{}" type="video/mp4">'
+        'Your browser does not support the video tag.</video>',
+        extra, sources, static(path),
+    )
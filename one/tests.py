@@ -1,3 +1,1005 @@
-from django.test import TestCase
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from . import ical, pagecache, resize
+from .availability import availability_cache
+from .cache import TieredCache, _flush_all_stats
+from .casting import CastingIndex
+from .images import available_derivatives, derivative_dir, derivative_name, generate_derivatives
+from .models import Blog, Booking, Client, MediaBlob, Model, Portfolio, ModelImage, SiteCounter
+from .storage import content_addressed_storage
+from .uploadhandlers import ApplicantPhotoUploadHandler
+from .viewcounts import BufferedCounter
+from .pagecache import model_tags, tag_versions
+from .signals import store_image_metadata
+
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+# Keep tests away from the shared on-disk cache in BASE_DIR/cache
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+
+
+def make_image(name='photo.jpg', size=(8, 8)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'white').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class MediaRootTestCase(TestCase):
+    """Point MEDIA_ROOT at a throwaway directory, use unhashed static files and a private cache."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(
+            MEDIA_ROOT=cls.media_root, STORAGES=TEST_STORAGES, CACHES=TEST_CACHES,
+        )
+        cls.settings_override.enable()
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+
+class ModelProfileQueryTests(MediaRootTestCase):
+    def create_model(self, portfolio_items, slideshow_images):
+        model = Model.objects.create(name=f'Model {Model.objects.count()}', gender='F', height=175, status='active')
+        for index in range(portfolio_items):
+            Portfolio.objects.create(
+                model=model, title=f'Shoot {index}', category='fashion',
+                image=make_image(), shoot_date=datetime.date(2024, 1, 1),
+            )
+        for index in range(slideshow_images):
+            ModelImage.objects.create(model=model, image=make_image(), order=index)
+        return model
+
+    def test_model_view_query_count_is_constant(self):
+        small = self.create_model(portfolio_items=1, slideshow_images=1)
+        large = self.create_model(portfolio_items=30, slideshow_images=8)
+
+        for model in (small, large):
+            with self.subTest(portfolio=model.portfolio.count()):
+                # One for the ETag/Last-Modified validators, three for the profile
+                with self.assertNumQueries(4):
+                    response = self.client.get(reverse('model-view', args=[model.pk]))
+                self.assertEqual(response.status_code, 200)
+
+    def test_model_view_bounds_related_lists(self):
+        model = self.create_model(portfolio_items=30, slideshow_images=8)
+        response = self.client.get(reverse('model-view', args=[model.pk]))
+        self.assertEqual(len(response.context['portfolio']), 24)
+        self.assertEqual([image.order for image in response.context['slideshow_images']], [0, 1, 2, 3])
+
+    def test_model_view_revalidates_without_rendering(self):
+        model = self.create_model(portfolio_items=3, slideshow_images=1)
+        url = reverse('model-view', args=[model.pk])
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        model.portfolio.first().delete()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+    @mock.patch('one.pagecache._template_first_seen', return_value=0)
+    def test_deleting_the_newest_item_moves_last_modified_forward(self, first_seen):
+        model = self.create_model(portfolio_items=2, slideshow_images=0)
+        older, newest = model.portfolio.order_by('pk')
+        hour_ago = timezone.now() - datetime.timedelta(hours=1)
+        Model.objects.filter(pk=model.pk).update(updated_at=hour_ago - datetime.timedelta(hours=1))
+        Portfolio.objects.filter(pk=older.pk).update(updated_at=hour_ago - datetime.timedelta(hours=1))
+        Portfolio.objects.filter(pk=newest.pk).update(updated_at=hour_ago)
+        url = reverse('model-view', args=[model.pk])
+        last_modified = self.client.get(url)['Last-Modified']
+
+        with self.captureOnCommitCallbacks(execute=True), mock.patch('one.signals.run_in_background'):
+            newest.delete()
+        response = self.client.get(url, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, newest.title)
+
+class PageCacheInvalidationTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        # Committed saves would start image-metadata threads against the test database
+        patcher = mock.patch('one.signals.run_in_background')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alice = Model.objects.create(name='Alice', gender='F', height=175, status='active')
+        self.bob = Model.objects.create(name='Bob', gender='M', height=185, status='active')
+
+    def test_profile_is_served_from_cache_until_the_model_changes(self):
+        url = reverse('model-view', args=[self.alice.pk])
+        self.client.get(url)
+        # Only the validator query; the page itself comes from the cache
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.alice.name = 'Alicia'
+            self.alice.save()
+        self.assertContains(self.client.get(url), 'ALICIA')
+
+    def test_portfolio_upload_only_invalidates_its_owner(self):
+        tags = ['roster', *model_tags(self.alice.pk), *model_tags(self.bob.pk)]
+        before = dict(zip(tags, tag_versions(tags)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Portfolio.objects.create(
+                model=self.alice, title='Shoot', category='fashion',
+                image=make_image(), shoot_date=datetime.date(2024, 1, 1),
+            )
+
+        after = dict(zip(tags, tag_versions(tags)))
+        changed = {tag for tag in tags if before[tag] != after[tag]}
+        self.assertEqual(changed, {f'portfolio:{self.alice.pk}'})
+
+    def test_invalidation_waits_for_commit(self):
+        tag = f'model:{self.alice.pk}'
+        [before] = tag_versions([tag])
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.alice.save()
+            self.assertEqual(tag_versions([tag]), [before])
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(tag_versions([tag]), [before])
+
+
+class ModelDirectoryCacheTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        for index in range(30):
+            Model.objects.create(name=f'Model {index:02}', gender='F', height=170, shoe_size='39', status='active')
+
+    def test_equivalent_queries_share_one_entry(self):
+        url = reverse('model-list')
+        self.client.get(url, {'gender': 'F', 'height_min': '160'})
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'junk': 'x', 'height_min': '160.0', 'gender': 'F', 'waist_max': '100'})
+        self.assertEqual(response.status_code, 200)
+        # Links are built from the validated filters, never from the raw query string
+        self.assertNotContains(response, 'junk')
+
+    def test_invalid_filters_are_not_cached(self):
+        url = reverse('model-list')
+        self.client.get(url, {'height_min': '205'})
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'height_min': '205'})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(DEBUG=False)
+class ManifestStaticPageTests(MediaRootTestCase):
+    """Every page renders with the production static storage, where {% static %} goes through the manifest."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        cls.static_override = override_settings(STATIC_ROOT=cls.static_root, STORAGES={
+            **TEST_STORAGES, 'staticfiles': {'BACKEND': 'one.storage.StaticFilesStorage'},
+        })
+        cls.static_override.enable()
+        # Compression doesn't change any URL and dominates collectstatic's run time
+        with mock.patch('one.storage.StaticFilesStorage.compress_files', return_value=()):
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.static_override.disable()
+        shutil.rmtree(cls.static_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_every_page_renders(self):
+        model = Model.objects.create(name='Alice', gender='F', height=175, status='active')
+        author = User.objects.create(username='editor')
+        blog = Blog.objects.create(title='Runway notes', slug='runway-notes', author=author, content='<p>Hi</p>', status=1)
+        urls = [
+            reverse(name) for name in (
+                'home', 'model-list', 'casting-search', 'apply_model', 'nta', 'ntaessence', 'ntavision',
+                'course_registration', 'ntacouture', 'ntaconnect', 'about', 'contact', 'blog_list',
+            )
+        ] + [reverse('model-view', args=[model.pk]), reverse('blog_detail', args=[blog.slug])]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = f'{self.directory}/cache.sqlite3'
+
+    def make_cache(self, **options):
+        return TieredCache(self.path, {'OPTIONS': options})
+
+    def shared_stats(self, tiered):
+        return dict(tiered._connection().execute('SELECT name, value FROM cache_stat'))
+
+    def test_workers_share_the_sqlite_tier(self):
+        first, second = self.make_cache(), self.make_cache(FRONT_TIMEOUT=0)
+        first.set('greeting', {'text': 'hello'})
+        self.assertEqual(second.get('greeting'), {'text': 'hello'})
+        first.delete('greeting')
+        self.assertIsNone(second.get('greeting'))
+
+    def test_get_or_set_computes_once_for_concurrent_misses(self):
+        tiered = self.make_cache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(tiered.get_or_set('slow', compute))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_close_flushes_counters_on_the_interval_only(self):
+        tiered = self.make_cache()
+        tiered.get('missing')
+        tiered.close()
+        self.assertEqual(self.shared_stats(tiered), {})
+
+        tiered._stats_flushed -= tiered.STATS_INTERVAL
+        tiered.close()
+        self.assertEqual(self.shared_stats(tiered), {'misses': 1})
+
+        tiered.get('missing')
+        _flush_all_stats()
+        self.assertEqual(self.shared_stats(tiered), {'misses': 2})
+
+
+class AvailableModelsTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = Model.objects.create(name='Alice', gender='F', height=175, chest_bust_size=84, shoe_size='38',
+                                          status='active')
+        self.bella = Model.objects.create(name='Bella', gender='F', height=178, chest_bust_size=96, shoe_size='40',
+                                          status='active')
+        self.window = {'start': '2030-05-01T09:00:00+00:00', 'end': '2030-05-01T17:00:00+00:00'}
+
+    def names(self, **filters):
+        response = self.client.get(reverse('available-models'), {**self.window, **filters})
+        self.assertEqual(response.status_code, 200)
+        return [model['name'] for model in response.json()['models']]
+
+    def test_filters_by_measurements_and_shoe_size(self):
+        self.assertEqual(self.names(), ['Alice', 'Bella'])
+        self.assertEqual(self.names(chest_bust_size_max='90'), ['Alice'])
+        self.assertEqual(self.names(shoe_size='40'), ['Bella'])
+
+    def test_booked_models_are_left_out(self):
+        client = Client.objects.create(name='Studio', client_type='brand', contact_person='Sam', email='s@example.com')
+        Booking.objects.create(
+            model=self.alice, client=client, booking_type='event', title='Show', description='',
+            start_date=datetime.datetime(2030, 5, 1, 12, tzinfo=datetime.timezone.utc),
+            end_date=datetime.datetime(2030, 5, 1, 20, tzinfo=datetime.timezone.utc),
+            location='Mumbai', rate=100, status='confirmed',
+        )
+        self.assertEqual(self.names(), ['Bella'])
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get(reverse('available-models'), {**self.window, 'shoe_size': '99', 'height_min': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'shoe_size', 'height_min'})
+
+
+class MediaBlobTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('one.signals.run_in_background')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.model = Model.objects.create(name='Alice', gender='F', height=175, status='active')
+
+    def create_portfolio(self):
+        return Portfolio.objects.create(
+            model=self.model, title='Shoot', category='fashion',
+            image=make_image(), shoot_date=datetime.date(2024, 1, 1),
+        )
+
+    def test_identical_uploads_share_one_file_until_the_last_reference_goes(self):
+        first, second = self.create_portfolio(), self.create_portfolio()
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(content_addressed_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            second.delete()
+            self.assertTrue(content_addressed_storage.exists(name))
+        self.assertTrue(callbacks)
+        self.assertFalse(content_addressed_storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_file_survives_a_reference_taken_before_commit(self):
+        first = self.create_portfolio()
+        name = first.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+            self.create_portfolio()
+        self.assertTrue(content_addressed_storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+
+    def test_sweep_deletes_unreferenced_blobs_and_stale_variants(self):
+        kept = self.create_portfolio().image.name
+        orphan = content_addressed_storage.save('portfolio/lost.jpg', make_image(size=(9, 9)))
+        variant = default_storage.save(derivative_name(orphan, 320, 'webp'), make_image())
+        stale = default_storage.save(derivative_name('models/profiles/gone.jpg', 320, 'webp'), make_image())
+        old = datetime.datetime(2020, 1, 1).timestamp()
+        os.utime(content_addressed_storage.path(orphan), (old, old))
+
+        call_command('sweep_media', verbosity=0, stdout=StringIO())
+        self.assertTrue(content_addressed_storage.exists(kept))
+        self.assertFalse(content_addressed_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(variant))
+        self.assertFalse(default_storage.exists(stale))
+
+
+class SiteCounterTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.model = Model.objects.create(name='Alice', gender='F', height=175, status='active')
+        self.studio = Client.objects.create(name='Studio', client_type='brand', contact_person='Sam',
+                                            email='studio@example.com')
+
+    def book(self, status):
+        return Booking.objects.create(
+            model=self.model, client=self.studio, booking_type='event', title='Show', description='',
+            start_date=datetime.datetime(2030, 5, 1, 10, tzinfo=datetime.timezone.utc),
+            end_date=datetime.datetime(2030, 5, 1, 18, tzinfo=datetime.timezone.utc),
+            location='Mumbai', rate=100, status=status,
+        )
+
+    def test_status_transitions_and_deletes_move_the_counters(self):
+        booking = self.book('confirmed')
+        self.assertEqual(SiteCounter.values(), {'active_models': 1, 'completed_bookings': 0, 'clients': 1})
+
+        booking.status = 'completed'
+        booking.save()
+        booking.save()
+        self.model.status = 'inactive'
+        self.model.save()
+        self.assertEqual(SiteCounter.values(), {'active_models': 0, 'completed_bookings': 1, 'clients': 1})
+
+        booking.delete()
+        self.studio.delete()
+        self.assertEqual(SiteCounter.values(), {'active_models': 0, 'completed_bookings': 0, 'clients': 0})
+
+    def test_fixture_rows_are_not_counted(self):
+        # What loaddata does: raw saves, timestamps taken from the fixture
+        now = timezone.now()
+        Model(name='Bob', gender='M', height=185, status='active', created_at=now, updated_at=now).save_base(raw=True)
+        Client(name='Agency', client_type='brand', contact_person='Kim', email='a@example.com',
+               created_at=now).save_base(raw=True)
+        self.assertEqual(SiteCounter.values(), {'active_models': 1, 'completed_bookings': 0, 'clients': 1})
+
+    def test_recount_corrects_drift(self):
+        Model.objects.create(name='Bob', gender='M', height=185, status='active')
+        SiteCounter.objects.filter(name=SiteCounter.ACTIVE_MODELS).update(value=7)
+        out = StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn('active_models: 2 (corrected by -5)', out.getvalue())
+        self.assertEqual(SiteCounter.values()['active_models'], 2)
+
+class BookingTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.model = Model.objects.create(name='Alice', gender='F', height=175, status='active')
+        self.studio = Client.objects.create(name='Studio', client_type='brand', contact_person='Sam',
+                                            email='studio@example.com')
+        self.url = reverse('book-model', args=[self.model.pk])
+        # The availability cache is per process and primary keys get reused between tests
+        with self.captureOnCommitCallbacks(execute=True):
+            availability_cache.invalidate(self.model.pk)
+
+    def existing_booking(self, status):
+        return Booking.objects.create(
+            model=self.model, client=self.studio, booking_type='event', title='Show', description='',
+            start_date=datetime.datetime(2030, 5, 1, 10, tzinfo=datetime.timezone.utc),
+            end_date=datetime.datetime(2030, 5, 1, 18, tzinfo=datetime.timezone.utc),
+            location='Mumbai', rate=100, status=status,
+        )
+
+    def book(self, **fields):
+        data = {
+            'client_name': 'Priya', 'client_email': 'priya@example.com', 'booking_type': 'photoshoot',
+            'title': 'Lookbook', 'description': 'Spring', 'location': 'Pune', 'budget': '500',
+            'start_date': '2030-05-01T12:00:00+00:00', 'end_date': '2030-05-01T14:00:00+00:00',
+            **fields,
+        }
+        return self.client.post(self.url, data)
+
+    def test_confirmed_overlap_is_rejected_without_recording_the_client(self):
+        self.existing_booking('confirmed')
+        self.book()
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertFalse(Client.objects.filter(email='priya@example.com').exists())
+
+    def test_pending_overlap_is_accepted_and_flagged(self):
+        pending = self.existing_booking('pending')
+        self.book()
+        booking = Booking.objects.get(client__email='priya@example.com')
+        self.assertIn(f'#{pending.pk}', booking.notes)
+
+    def test_availability_is_reread_after_a_booking_commits(self):
+        window = (datetime.datetime(2030, 5, 1, 12, tzinfo=datetime.timezone.utc),
+                  datetime.datetime(2030, 5, 1, 14, tzinfo=datetime.timezone.utc))
+        self.assertTrue(availability_cache.get(self.model.pk).is_free(*window))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.existing_booking('confirmed')
+        self.assertFalse(availability_cache.get(self.model.pk).is_free(*window))
+
+    def test_retried_submission_books_once(self):
+        for _ in range(2):
+            self.book(idempotency_key='form-1')
+        self.assertEqual(Booking.objects.filter(idempotency_key='form-1').count(), 1)
+        self.assertEqual(Client.objects.filter(email='priya@example.com').count(), 1)
+
+
+class ResizedMediaTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        patcher = mock.patch('one.resize.RESIZE_CACHE_DIR', cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.name = default_storage.save('models/profiles/leo.jpg', make_image(size=(800, 600)))
+
+    def get(self, size):
+        return self.client.get(f'/media/r/{size}/{self.name}', HTTP_ACCEPT='image/webp')
+
+    def test_serves_listed_sizes_only(self):
+        response = self.get('320x0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(image.size, (320, 240))
+        self.assertEqual(self.get('321x0').status_code, 404)
+
+    def test_entry_evicted_between_requests_is_rendered_again(self):
+        self.get('320x0')
+        with mock.patch('one.resize._render', wraps=resize._render) as render:
+            shutil.rmtree(resize.RESIZE_CACHE_DIR)
+            response = self.get('320x0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(render.call_count, 1)
+        self.assertTrue(b''.join(response.streaming_content))
+
+
+class CalendarFeedTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.model = Model.objects.create(name='Alice', gender='F', height=175, status='active')
+        self.studio = Client.objects.create(name='Studio', client_type='brand', contact_person='Sam',
+                                            email='studio@example.com')
+
+    def book(self, title, days_from_now):
+        start = timezone.now() + datetime.timedelta(days=days_from_now)
+        return Booking.objects.create(
+            model=self.model, client=self.studio, booking_type='event', title=title, description='',
+            start_date=start, end_date=start + datetime.timedelta(hours=4),
+            location='Mumbai', rate=100, status='confirmed',
+        )
+
+    def test_feed_starts_at_the_past_window(self):
+        self.book('Last season', -(ical.PAST_DAYS + 1))
+        self.book('Last week', -7)
+        body = ical.model_feed(self.model.pk)['body']
+        self.assertIn('SUMMARY:Last week', body)
+        self.assertNotIn('Last season', body)
+
+    def test_cached_feed_is_dropped_when_the_booking_commits(self):
+        ical.model_feed(self.model.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book('Campaign', 3)
+            self.assertNotIn('Campaign', ical.model_feed(self.model.pk)['body'])
+        self.assertIn('Campaign', ical.model_feed(self.model.pk)['body'])
+
+
+    def test_cancelling_or_deleting_a_booking_moves_last_modified_forward(self):
+        def cancel(booking):
+            booking.status = 'cancelled'
+            booking.save()
+
+        for action, remove in (('cancel', cancel), ('delete', lambda booking: booking.delete())):
+            with self.captureOnCommitCallbacks(execute=True):
+                booking = self.book('Campaign', 3)
+            hours_ago = timezone.now() - datetime.timedelta(hours=2)
+            Model.objects.filter(pk=self.model.pk).update(updated_at=hours_ago)
+            Booking.objects.filter(model=self.model).update(updated_at=hours_ago)
+            before = ical.model_feed(self.model.pk)['last_modified']
+            with self.captureOnCommitCallbacks(execute=True):
+                remove(booking)
+            feed = ical.model_feed(self.model.pk)
+            with self.subTest(action):
+                self.assertNotIn('Campaign', feed['body'])
+                self.assertGreater(feed['last_modified'], before)
+
+class BlogContentTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create(username='editor')
+
+    def create_blog(self, content, **fields):
+        return Blog.objects.create(author=self.author, content=content,
+                                   **{'title': 'Runway notes', 'slug': 'runway-notes', 'status': 1, **fields})
+
+    def test_body_is_sanitised_and_minified_at_save(self):
+        blog = self.create_blog(
+            '<p onclick="steal()">Hello   <b>world</b></p>\n\n<script>alert(1)</script>'
+            '<a href="javascript:alert(1)" target="_blank">link</a><!-- draft --><img src="x.png">'
+        )
+        self.assertEqual(
+            blog.rendered_content,
+            '<p>Hello <b>world</b></p> <a rel="noopener noreferrer" target="_blank">link</a>'
+            '<img decoding="async" loading="lazy" src="x.png">',
+        )
+
+    def test_saving_other_fields_does_not_rerender(self):
+        blog = self.create_blog('<p>Hello</p>', status=0)
+        blog.status = 1
+        with mock.patch('one.models.render_blog_content') as render:
+            blog.save(update_fields=['status'])
+        render.assert_not_called()
+
+    def test_posts_saved_before_rendering_are_rendered_on_first_view(self):
+        blog = self.create_blog('<p>Hello <script>x</script></p>')
+        Blog.objects.filter(pk=blog.pk).update(rendered_content='')
+        response = self.client.get(reverse('blog_detail', args=[blog.slug]))
+        self.assertContains(response, '<p>Hello </p>', html=False)
+        self.assertEqual(Blog.objects.get(pk=blog.pk).rendered_content, '<p>Hello </p>')
+
+
+    def assert_removal_moves_last_modified(self, remove):
+        posts = [self.create_blog('<p>Hello</p>', title=f'Post {index}', slug=f'post-{index}') for index in range(3)]
+        for hours, post in zip((3, 2, 1), posts):
+            Blog.objects.filter(pk=post.pk).update(updated_on=timezone.now() - datetime.timedelta(hours=hours))
+        url = reverse('blog_detail', args=[posts[0].slug])
+        with mock.patch('one.pagecache._template_first_seen', return_value=0):
+            last_modified = self.client.get(url)['Last-Modified']
+            # The newest post is in the sidebar and holds the page's Last-Modified
+            remove(posts[2])
+            response = self.client.get(url, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, posts[2].title)
+
+    def test_deleting_a_recent_post_moves_last_modified_forward(self):
+        self.assert_removal_moves_last_modified(lambda post: post.delete())
+
+    def test_unpublishing_a_recent_post_moves_last_modified_forward(self):
+        def unpublish(post):
+            post.status = 0
+            post.save()
+        self.assert_removal_moves_last_modified(unpublish)
+
+class BlogViewCountTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        author = User.objects.create(username='editor')
+        for slug in ('spring', 'summer'):
+            Blog.objects.create(title=slug, slug=slug, author=author, content='<p>Hello</p>', status=1)
+        # Flush by hand instead of from the background thread
+        patcher = mock.patch.object(BufferedCounter, '_start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.counter = BufferedCounter(Blog, 'slug', 'views')
+
+    def views(self):
+        return dict(Blog.objects.values_list('slug', 'views'))
+
+    def test_hits_are_written_in_one_update_per_key(self):
+        for slug in ('spring', 'spring', 'summer', 'spring'):
+            self.counter.hit(slug)
+        self.assertEqual(self.counter.pending('spring'), 3)
+        self.assertEqual(self.views(), {'spring': 0, 'summer': 0})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.counter.flush()
+        updates = [query for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(self.views(), {'spring': 3, 'summer': 1})
+        self.assertEqual(self.counter.pending('spring'), 0)
+
+    def test_failed_flush_keeps_the_hits_for_the_next_one(self):
+        self.counter.hit('spring', 2)
+        with mock.patch.object(Blog.objects, 'filter', side_effect=RuntimeError('locked')), \
+                self.assertLogs('one.viewcounts', 'ERROR'):
+            self.counter.flush()
+        self.assertEqual(self.counter.pending('spring'), 2)
+
+        self.counter.flush()
+        self.assertEqual(self.views()['spring'], 2)
+
+class CastingSearchTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        # A fresh index, loaded from this test's rows on the first query
+        patcher = mock.patch('one.views.casting_index', CastingIndex())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alice = Model.objects.create(name='Alice', gender='F', height=175, waist=62, status='active')
+        self.bella = Model.objects.create(name='Bella', gender='F', height=168, waist=70, status='active')
+
+    def search(self, **params):
+        response = self.client.get(reverse('casting-search-json'), params)
+        self.assertEqual(response.status_code, 200)
+        return [result['name'] for result in response.json()['results']]
+
+    def test_results_are_ordered_by_distance(self):
+        self.assertEqual(self.search(height='176', waist='63'), ['Alice', 'Bella'])
+        self.assertEqual(self.search(height='167'), ['Bella', 'Alice'])
+
+    def test_models_deactivated_since_the_index_loaded_are_left_out(self):
+        self.search(height='170')
+        Model.objects.filter(pk=self.alice.pk).update(status='inactive')
+        self.assertEqual(self.search(height='176'), ['Bella'])
+
+
+class MediaServingTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.name = default_storage.save('docs/rate card.txt', ContentFile(b'0123456789'))
+        self.url = reverse('media', args=[self.name])
+
+    def test_validators_and_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_byte_ranges(self):
+        for header, content_range, body in (
+            ('bytes=2-5', 'bytes 2-5/10', b'2345'),
+            ('bytes=7-', 'bytes 7-9/10', b'789'),
+            ('bytes=-3', 'bytes 7-9/10', b'789'),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(b''.join(response.streaming_content), body)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=10-').status_code, 416)
+
+    def test_stale_if_range_returns_the_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_no_range_of_an_empty_file_is_satisfiable(self):
+        name = default_storage.save('docs/empty.txt', ContentFile(b''))
+        response = self.client.get(reverse('media', args=[name]), HTTP_RANGE='bytes=-5')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_accel_redirect_is_percent_encoded(self):
+        with mock.patch('one.media.MEDIA_ACCEL', 'nginx'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/internal-media/docs/rate%20card.txt')
+
+
+class OptimizeMediaTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('one.signals.run_in_background')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.model = Model.objects.create(name='Alice', gender='F', height=175, status='active')
+
+    def noisy_png(self, size):
+        # Noise compresses badly as PNG, so the JPEG re-encode always saves enough
+        buffer = BytesIO()
+        Image.effect_noise(size, 40).convert('RGB').save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def optimize(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                'optimize_media', min_bytes=0, workers=1, report=os.path.join(self.media_root, 'report.csv'),
+                stdout=StringIO(),
+            )
+
+    def test_repointed_rows_get_a_new_modification_time(self):
+        portfolio = Portfolio.objects.create(
+            model=self.model, title='Shoot', category='fashion', shoot_date=datetime.date(2024, 1, 1),
+            image=SimpleUploadedFile('shoot.png', self.noisy_png((64, 64)), content_type='image/png'),
+        )
+        Portfolio.objects.filter(pk=portfolio.pk).update(updated_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+
+        self.optimize()
+        portfolio.refresh_from_db()
+        self.assertTrue(portfolio.image.name.endswith('.jpg'))
+        self.assertGreater(portfolio.updated_at.year, 2020)
+
+    def test_repointed_profile_png_has_its_variants_on_disk(self):
+        old_name = default_storage.save('models/profiles/leo.png', ContentFile(self.noisy_png((700, 500))))
+        self.model.profile_image = old_name
+        self.model.save()
+
+        self.optimize()
+        self.model.refresh_from_db()
+        new_name = self.model.profile_image.name
+        self.assertEqual(new_name, 'models/profiles/leo.jpg')
+        variants = available_derivatives(self.model.profile_image)
+        self.assertEqual(variants['jpg'], [320, 640, 700])
+        for ext, widths in variants.items():
+            for width in widths:
+                self.assertTrue(default_storage.exists(derivative_name(new_name, width, ext)))
+        self.assertEqual(default_storage.listdir(derivative_dir(old_name))[1], [])
+
+
+class ImageDerivativeTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('one.signals.run_in_background')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def variant_files(self, name):
+        try:
+            return sorted(default_storage.listdir(derivative_dir(name))[1])
+        except FileNotFoundError:
+            return []
+
+    def test_widths_recorded_at_upload_are_rendered_without_listing_the_directory(self):
+        model = Model.objects.create(name='Alice', gender='F', height=175, status='active',
+                                     profile_image=make_image(size=(700, 500)))
+        with mock.patch.object(default_storage, 'listdir') as listdir:
+            variants = available_derivatives(model.profile_image)
+            response = self.client.get(reverse('model-view', args=[model.pk]))
+        listdir.assert_not_called()
+        self.assertEqual(variants, {'webp': [320, 640, 700], 'jpg': [320, 640, 700]})
+        self.assertContains(response, derivative_name(model.profile_image.name, 700, 'webp'))
+
+    def test_regenerating_a_smaller_source_removes_the_larger_widths(self):
+        name = default_storage.save('models/profiles/leo.jpg', make_image(size=(1000, 800)))
+        field_file = Model(profile_image=name).profile_image
+        generate_derivatives(field_file)
+        with default_storage.open(name, 'wb') as fh:
+            Image.new('RGB', (500, 400), 'white').save(fh, 'JPEG')
+        generate_derivatives(field_file)
+        self.assertEqual(self.variant_files(name), ['320.jpg', '320.webp', '500.jpg', '500.webp'])
+        self.assertEqual(available_derivatives(field_file)['jpg'], [320, 500])
+
+    def test_replacement_with_the_same_stem_and_another_extension_keeps_its_variants(self):
+        buffer = BytesIO()
+        Image.new('RGB', (700, 500), 'white').save(buffer, 'PNG')
+        old_name = default_storage.save('models/profiles/leo.png', ContentFile(buffer.getvalue()))
+        model = Model.objects.create(name='Leo', gender='M', height=185, status='active', profile_image=old_name)
+        new_name = default_storage.save('models/profiles/leo.jpg', make_image(size=(400, 300)))
+        with self.captureOnCommitCallbacks(execute=True):
+            model.profile_image = new_name
+            model.save()
+
+        variants = available_derivatives(model.profile_image)
+        self.assertEqual(variants, {'webp': [320, 400], 'jpg': [320, 400]})
+        for ext, widths in variants.items():
+            for width in widths:
+                self.assertTrue(default_storage.exists(derivative_name(new_name, width, ext)))
+        self.assertEqual(self.variant_files(old_name), [])
+
+    def test_replaced_source_loses_its_variants_after_commit(self):
+        model = Model.objects.create(name='Alice', gender='F', height=175, status='active',
+                                     profile_image=make_image(size=(400, 300)))
+        old_name = model.profile_image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            model.profile_image = make_image('new.jpg', size=(400, 300))
+            model.save()
+            self.assertTrue(self.variant_files(old_name))
+        self.assertEqual(self.variant_files(old_name), [])
+        self.assertEqual(available_derivatives(Model(profile_image=old_name).profile_image), {})
+        self.assertTrue(self.variant_files(model.profile_image.name))
+
+
+class ImageMetadataTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        self.model = Model.objects.create(name='Alice', gender='F', height=175, status='active')
+        # Run the metadata job inline instead of on a worker thread
+        patcher = mock.patch('one.signals.run_in_background', side_effect=lambda func, *args: func(*args))
+        self.run_in_background = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, image, name='look.jpg'):
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', exif=image.getexif())
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def create_item(self, image):
+        return Portfolio.objects.create(model=self.model, title='Shoot', category='fashion',
+                                        image=image, shoot_date=datetime.date(2024, 1, 1))
+
+    def test_size_and_placeholder_are_stored_on_save(self):
+        item = self.create_item(self.upload(Image.new('RGB', (40, 20), 'red')))
+        item.refresh_from_db()
+        self.assertEqual((item.image_width, item.image_height), (40, 20))
+        self.assertTrue(item.image_placeholder.startswith('data:image/webp;base64,'))
+        self.assertLess(len(item.image_placeholder), 1000)
+
+    def test_size_follows_exif_orientation(self):
+        image = Image.new('RGB', (40, 20), 'red')
+        image.getexif()[0x0112] = 6  # Rotated 90 degrees
+        item = self.create_item(self.upload(image))
+        item.refresh_from_db()
+        self.assertEqual((item.image_width, item.image_height), (20, 40))
+
+    def test_replacing_the_image_clears_the_old_metadata(self):
+        item = self.create_item(self.upload(Image.new('RGB', (40, 20), 'red')))
+        item.refresh_from_db()
+        self.run_in_background.side_effect = None
+        item.image = self.upload(Image.new('RGB', (30, 30), 'blue'), 'other.jpg')
+        item.save()
+        item.refresh_from_db()
+        self.assertEqual((item.image_width, item.image_height, item.image_placeholder), (None, None, ''))
+        self.run_in_background.assert_called_with(store_image_metadata, Portfolio, item.pk, 'image', item.image.name)
+
+@override_settings(STORAGES=TEST_STORAGES)
+class HeroVideoTagTests(SimpleTestCase):
+    def render(self, *static_files):
+        with mock.patch('one.templatetags.media_tags.static_exists', side_effect=set(static_files).__contains__):
+            return Template(
+                "{% load media_tags %}{% hero_video 'images/ntavid.mp4' class='bg-video' %}"
+            ).render(Context())
+
+    def test_renditions_are_offered_smallest_first_before_the_original(self):
+        html = self.render(
+            'images/renditions/ntavid-480p.webm', 'images/renditions/ntavid-720p.webm',
+            'images/renditions/ntavid-poster.jpg',
+        )
+        self.assertHTMLEqual(html, (
+            '<video autoplay muted loop playsinline poster="{poster}" class="bg-video">'
+            '<source src="{small}" type="video/webm" media="(max-width: 767px)">'
+            '<source src="{medium}" type="video/webm" media="(max-width: 1279px)">'
+            '<source src="{original}" type="video/mp4">'
+            'Your browser does not support the video tag.</video>'
+        ).format(
+            poster=static('images/renditions/ntavid-poster.jpg'),
+            small=static('images/renditions/ntavid-480p.webm'),
+            medium=static('images/renditions/ntavid-720p.webm'),
+            original=static('images/ntavid.mp4'),
+        ))
+
+    def test_missing_renditions_fall_back_to_the_original(self):
+        html = self.render('images/renditions/ntavid-720p.webm')
+        self.assertHTMLEqual(html, (
+            '<video autoplay muted loop playsinline class="bg-video">'
+            '<source src="{medium}" type="video/webm" media="(max-width: 1279px)">'
+            '<source src="{original}" type="video/mp4">'
+            'Your browser does not support the video tag.</video>'
+        ).format(medium=static('images/renditions/ntavid-720p.webm'), original=static('images/ntavid.mp4')))
+        self.assertNotIn('poster', html)
+
+class MarketingPageCacheTests(MediaRootTestCase):
+    def test_page_is_rendered_once_per_deploy(self):
+        url = reverse('nta')
+        with mock.patch('one.pagecache.render_to_string', wraps=pagecache.render_to_string) as render:
+            first = self.client.get(url)
+            second = self.client.get(url)
+            self.assertEqual(render.call_count, 1)
+            self.assertEqual(first.content, second.content)
+            # New templates or static files (a deploy) change the fingerprint
+            with mock.patch('one.pagecache.template_fingerprint', return_value='next-deploy'):
+                self.client.get(url)
+        self.assertEqual(render.call_count, 2)
+
+    def test_logged_in_users_get_a_fresh_render(self):
+        self.client.force_login(User.objects.create(username='staff'))
+        with mock.patch('one.pagecache.render_to_string') as render:
+            self.assertEqual(self.client.get(reverse('about')).status_code, 200)
+        render.assert_not_called()
+
+
+class BlogListTests(MediaRootTestCase):
+    def setUp(self):
+        super().setUp()
+        author = User.objects.create(username='editor')
+        for index in range(30):
+            Blog.objects.create(title=f'Post {index:02}', slug=f'post-{index:02}', author=author,
+                                content='<p>Runway report</p>', status=1)
+        # Ties on created_on are broken by id
+        Blog.objects.update(created_on=datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc))
+
+    def test_cursor_pages_cover_every_post_once(self):
+        titles, after = [], None
+        while True:
+            response = self.client.get(reverse('blog_list_more'), {'after': after} if after else {})
+            titles += [blog.title for blog in response.context['blogs']]
+            after = response.context['next_cursor']
+            if not after:
+                break
+        self.assertEqual(titles, [f'Post {index:02}' for index in reversed(range(30))])
+
+    def test_tampered_cursor_is_a_404(self):
+        self.assertEqual(self.client.get(reverse('blog_list'), {'after': 'not-a-cursor'}).status_code, 404)
+
+    def test_search_ranks_title_matches_first_and_highlights_them(self):
+        author = User.objects.get(username='editor')
+        Blog.objects.create(title='Backstage', slug='backstage', author=author, content='<p>Lighting for castings</p>',
+                            status=1)
+        Blog.objects.create(title='Casting tips', slug='casting-tips', author=author, content='<p>Be on time</p>',
+                            status=1)
+        response = self.client.get(reverse('blog_list'), {'search': 'cast'})
+        blogs = response.context['blogs']
+        self.assertEqual([blog.title for blog in blogs], ['Casting tips', 'Backstage'])
+        self.assertIn('<mark>castings</mark>', blogs[1].snippet)
+
+
+class ApplicantPhotoUploadTests(SimpleTestCase):
+    def upload(self, filename, data, content_type='image/jpeg'):
+        upload = SimpleUploadedFile(filename, data, content_type=content_type)
+        request = RequestFactory().post('/apply/', {'photo1': upload})
+        request.upload_handlers = [ApplicantPhotoUploadHandler(request)]
+        return request.FILES, request.upload_errors
+
+    def jpeg(self, size):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'white').save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+    def test_large_photos_are_stored_downscaled(self):
+        files, errors = self.upload('portrait.jpeg', self.jpeg((3000, 1500)))
+        self.assertEqual(errors, {})
+        with Image.open(files['photo1']) as image:
+            self.assertEqual(image.size, (2048, 1024))
+
+    def test_files_that_are_not_images_are_rejected(self):
+        files, errors = self.upload('cv.jpg', b'%PDF-1.7' + b'x' * 300_000, 'application/pdf')
+        self.assertNotIn('photo1', files)
+        self.assertIn('photo1', errors)
+
+    def test_oversized_uploads_are_rejected_while_streaming(self):
+        with mock.patch('one.uploadhandlers.PHOTO_MAX_BYTES', 1024):
+            files, errors = self.upload('huge.jpg', self.jpeg((400, 400)) + b'\0' * 4096)
+        self.assertNotIn('photo1', files)
+        self.assertIn('smaller than', errors['photo1'])
@@ -0,0 +1,92 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from PIL import Image
+
+from .images import encode_optimized
+
+PHOTO_MAX_BYTES = getattr(settings, 'APPLICANT_PHOTO_MAX_BYTES', 25 * 1024 * 1024)
+PHOTO_MAX_DIMENSION = getattr(settings, 'APPLICANT_PHOTO_MAX_DIMENSION', 2048)
+PHOTO_MAX_DECODE_PIXELS = getattr(settings, 'APPLICANT_PHOTO_MAX_DECODE_PIXELS', 16_000_000)
+PHOTO_FORMATS = ('JPEG', 'PNG', 'WEBP')
+HEADER_MAX_BYTES = 256 * 1024
+
+
+class ApplicantPhotoUploadHandler(FileUploadHandler):
+    """Stream applicant photos to disk and store a downscaled copy.
+
+    The image header is parsed from the first chunks, so unsupported formats,
+    oversized files and images too large to decode are rejected before the
+    rest of the body is written anywhere. JPEGs are decoded with Pillow's
+    draft mode at the smallest scale that still covers the target size,
+    which keeps peak memory per photo near PHOTO_MAX_DECODE_PIXELS * 4 bytes
+    regardless of the camera resolution.
+
+    Rejections are recorded on ``request.upload_errors`` (field -> message)
+    so the form can report them.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        if request is not None and not hasattr(request, 'upload_errors'):
+            request.upload_errors = {}
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = TemporaryUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.header = bytearray()
+        self.header_checked = False
+
+    def _reject(self, message):
+        self.file.close()
+        if self.request is not None:
+            self.request.upload_errors[self.field_name] = message
+        raise SkipFile()
+
+    def _check_header(self):
+        try:
+            with Image.open(BytesIO(self.header)) as image:
+                image_format = image.format
+                image.draft('RGB', (PHOTO_MAX_DIMENSION, PHOTO_MAX_DIMENSION))
+                decode_width, decode_height = image.size
+        except Exception:
+            if len(self.header) >= HEADER_MAX_BYTES:
+                self._reject("Upload a valid JPEG, PNG or WebP image.")
+            return
+
+        self.header_checked = True
+        self.header = None
+        if image_format not in PHOTO_FORMATS:
+            self._reject("Upload a valid JPEG, PNG or WebP image.")
+        if decode_width * decode_height > PHOTO_MAX_DECODE_PIXELS:
+            self._reject("This image is too large. Please upload a smaller photo.")
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > PHOTO_MAX_BYTES:
+            self._reject(f"Photos must be smaller than {PHOTO_MAX_BYTES // (1024 * 1024)} MB.")
+        if not self.header_checked:
+            self.header += raw_data
+            self._check_header()
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        source = self.file
+        try:
+            source.seek(0)
+            with Image.open(source) as image:
+                image.draft('RGB', (PHOTO_MAX_DIMENSION, PHOTO_MAX_DIMENSION))
+                data, ext = encode_optimized(image, PHOTO_MAX_DIMENSION)
+        except Exception:
+            if self.request is not None:
+                self.request.upload_errors[self.field_name] = "Upload a valid JPEG, PNG or WebP image."
+            return None
+        finally:
+            source.close()
+
+        name = os.path.splitext(self.file_name)[0] + ext
+        content_type = 'image/png' if ext == '.png' else 'image/jpeg'
+        return InMemoryUploadedFile(BytesIO(data), self.field_name, name, content_type, len(data), None)
@@ -0,0 +1,111 @@
+import os
+import posixpath
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+
+RENDITION_DIR = 'renditions'
+# (height, media query) from smallest to largest; anything wider gets the original
+RENDITIONS = (
+    (480, '(max-width: 767px)'),
+    (720, '(max-width: 1279px)'),
+)
+POSTER_MAX_WIDTH = 1280
+HERO_VIDEOS = getattr(settings, 'HERO_VIDEOS', ('images/homemain.mp4', 'images/ntavid.mp4'))
+
+
+# -------------------------
+# Naming
+# -------------------------
+def rendition_name(path, height):
+    directory, filename = posixpath.split(path)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, RENDITION_DIR, f'{stem}-{height}p.webm')
+
+
+def poster_name(path):
+    directory, filename = posixpath.split(path)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, RENDITION_DIR, f'{stem}-poster.jpg')
+
+
+@lru_cache(maxsize=None)
+def static_exists(path):
+    """Whether `path` is a static file. Cached: static files only change on deploy."""
+    return finders.find(path) is not None
+
+
+# -------------------------
+# Building (OpenCV)
+# -------------------------
+def build_renditions(source, poster_at=1.0):
+    """Write the poster frame and lower-resolution WebM renditions of `source`.
+
+    `source` is a filesystem path; outputs go to a `renditions/` directory
+    next to it. Frames are decoded once and fanned out to every writer.
+    Renditions are only produced below the source height. OpenCV does not
+    expose an encoder bitrate, so a rendition that comes out larger than the
+    source file is discarded. Audio is not carried over (hero videos
+    autoplay muted). Returns the written paths.
+    """
+    import cv2
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise OSError(f"Cannot open video {source}")
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    poster_frame = int(fps * poster_at)
+
+    output_dir = os.path.join(os.path.dirname(source), RENDITION_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    filename = os.path.basename(source)
+
+    writers = []
+    for target_height, _media in RENDITIONS:
+        if target_height >= height:
+            continue
+        # Even dimensions keep the VP8 encoder happy
+        size = (round(width * target_height / height / 2) * 2, target_height)
+        path = os.path.join(output_dir, posixpath.basename(rendition_name(filename, target_height)))
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'VP80'), fps, size)
+        if not writer.isOpened():
+            raise OSError(f"OpenCV cannot encode WebM/VP8 for {path}")
+        writers.append((writer, size, path))
+
+    poster_path = os.path.join(output_dir, posixpath.basename(poster_name(filename)))
+    poster = None
+    index = 0
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            if index == poster_frame or poster is None:
+                poster = frame
+            for writer, size, _path in writers:
+                writer.write(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+            index += 1
+    finally:
+        capture.release()
+        for writer, _size, _path in writers:
+            writer.release()
+
+    if poster is None:
+        raise OSError(f"No frames decoded from {source}")
+    if poster.shape[1] > POSTER_MAX_WIDTH:
+        poster_size = (POSTER_MAX_WIDTH, round(poster.shape[0] * POSTER_MAX_WIDTH / poster.shape[1]))
+        poster = cv2.resize(poster, poster_size, interpolation=cv2.INTER_AREA)
+    cv2.imwrite(poster_path, poster, [cv2.IMWRITE_JPEG_QUALITY, 80, cv2.IMWRITE_JPEG_PROGRESSIVE, 1])
+
+    written = [poster_path]
+    source_size = os.path.getsize(source)
+    for _writer, _size, path in writers:
+        if os.path.getsize(path) < source_size:
+            written.append(path)
+        else:
+            os.remove(path)
+    return written
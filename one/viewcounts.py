@@ -0,0 +1,79 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Blog
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 5)
+
+
+class BufferedCounter:
+    """Accumulate increments in memory and write them in batches.
+
+    ``hit(key)`` only touches a dict under a lock. A daemon thread calls
+    ``flush()`` every `interval` seconds, issuing one
+    ``UPDATE ... SET field = field + n`` per key inside a single transaction;
+    a final flush runs at interpreter shutdown. Each process keeps its own
+    buffer, so at most `interval` seconds of hits per process are lost if it
+    is killed outright.
+    """
+
+    def __init__(self, model, lookup, field, interval=FLUSH_INTERVAL):
+        self.model = model
+        self.lookup = lookup
+        self.field = field
+        self.interval = interval
+        self._pending = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def hit(self, key, count=1):
+        with self._lock:
+            self._pending[key] += count
+            if self._thread is None:
+                self._start()
+
+    def pending(self, key):
+        with self._lock:
+            return self._pending[key]
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, Counter()
+        if not batch:
+            return
+        try:
+            with transaction.atomic():
+                for key, count in batch.items():
+                    self.model.objects.filter(**{self.lookup: key}).update(
+                        **{self.field: F(self.field) + count}
+                    )
+        except Exception:
+            logger.exception("Could not flush %s.%s counts", self.model.__name__, self.field)
+            with self._lock:
+                self._pending.update(batch)
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name=f'{self.field}-counter', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+
+blog_views = BufferedCounter(Blog, 'slug', 'views')
@@ -1,46 +1,126 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Q
+from django.db.models import Count
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from datetime import datetime
 
-from .models import Model, Portfolio, Booking, Client, Blog, ContactForm
-from .forms import ModelApplicationForm, ContactFormForm, CourseRegistrationForm
+from .models import Model, Booking, Client, Blog, ContactForm, SiteCounter
+from .forms import (
+    ModelApplicationForm, ContactFormForm, CourseRegistrationForm, ModelDirectoryFilterForm, CastingSearchForm
+)
+from .availability import availability_cache, booking_window, find_conflicts, free_models
+from .casting import casting_index
+from . import ical, search
+from .media import serve
+from .pagecache import (
+    ROSTER_TAG, STATS_TAG, cached_render, conditional_render, model_tags, render_cached, tagged_get_or_set,
+)
+from .pagination import InvalidCursor, keyset_page
+from .queries import RECENT_POSTS_LIMIT, blog_post_version, load_model_profile, model_profile_version
+from .resize import ResizeError, get_resized
+from .uploadhandlers import ApplicantPhotoUploadHandler
+from .viewcounts import blog_views
+
+BLOG_PAGE_SIZE = getattr(settings, 'BLOG_PAGE_SIZE', 12)
+MODEL_PAGE_SIZE = getattr(settings, 'MODEL_PAGE_SIZE', 24)
+# Columns the directory cards (and responsive_image) read
+MODEL_CARD_FIELDS = (
+    'id', 'name', 'gender', 'height', 'chest_bust_type', 'chest_bust_size', 'waist',
+    'profile_image', 'profile_image_width', 'profile_image_height', 'profile_image_placeholder',
+)
 
 # Home view
 def home(request):
+    return cached_render(request, 'home.html', _home_context, tags=(ROSTER_TAG, STATS_TAG))
+
+def _home_context():
     featured_models = Model.objects.filter(status='active')[:12]
-    total_models = Model.objects.filter(status='active').count()
-    total_bookings = Booking.objects.filter(status='completed').count()
-    total_clients = Client.objects.count()
-    
-    context = {
+    counters = SiteCounter.values()
+
+    return {
         'featured_models': featured_models,
-        'total_models': total_models,
-        'total_bookings': total_bookings,
-        'total_clients': total_clients,
+        'total_models': counters[SiteCounter.ACTIVE_MODELS],
+        'total_bookings': counters[SiteCounter.COMPLETED_BOOKINGS],
+        'total_clients': counters[SiteCounter.CLIENTS],
     }
-    return render(request, 'home.html', context)
 
 # Model detail view
 def model_view(request, pk):
-    model = get_object_or_404(Model, pk=pk)
-    portfolio = Portfolio.objects.filter(model=model).order_by('-created_at')
-    slideshow_images = model.slideshow_images.all()[:4]
-    
-    context = {
+    version, last_modified = model_profile_version(pk)
+    return conditional_render(
+        request, 'model.html', version, last_modified,
+        lambda: cached_render(request, 'model.html', lambda: _model_context(pk), tags=model_tags(pk)),
+    )
+
+def _model_context(pk):
+    model = load_model_profile(pk)
+
+    return {
         'model': model,
-        'portfolio': portfolio,
-        'slideshow_images': slideshow_images,
+        'portfolio': model.portfolio_items,
+        'slideshow_images': model.slideshow,
     }
-    return render(request, 'model.html', context)
 
 # Model list view
 def model_list(request):
-    models = Model.objects.filter(status='active').order_by('name')
-    return render(request, 'model_list.html', {'models': models})
+    shoe_sizes = _roster_shoe_sizes()
+    form = ModelDirectoryFilterForm(request.GET, shoe_sizes=shoe_sizes)
+    if not form.is_valid():
+        # Not cached: arbitrary input must not be able to create cache entries
+        return render(request, 'model_list.html', _model_list_context(request.GET, shoe_sizes))
+
+    # Only the validated filters and the cursor select a page, so junk or reordered parameters share an entry
+    query = form.canonical_query()
+    if request.GET.get('after'):
+        query['after'] = request.GET['after']
+    return cached_render(request, 'model_list.html', lambda: _model_list_context(query, shoe_sizes),
+                         variant=query.urlencode(), tags=(ROSTER_TAG,))
+
+def _model_list_context(query, shoe_sizes):
+    active = Model.objects.filter(status='active')
+    form = ModelDirectoryFilterForm(query, shoe_sizes=shoe_sizes)
+    models = form.filter(active).only(*MODEL_CARD_FIELDS)
+    try:
+        page, next_cursor = keyset_page(models, ['name'], query.get('after'), MODEL_PAGE_SIZE)
+    except InvalidCursor:
+        raise Http404("Invalid page")
+
+    next_query = None
+    if next_cursor:
+        next_page = query.copy()
+        next_page['after'] = next_cursor
+        next_query = next_page.urlencode()
+    first_query = query.copy()
+    first_query.pop('after', None)
+
+    return {
+        'models': page,
+        'form': form,
+        'next_query': next_query,
+        'first_query': first_query.urlencode() if 'after' in query else None,
+    }
+
+def _roster_shoe_sizes():
+    return tagged_get_or_set('shoe-sizes', lambda: _shoe_sizes(Model.objects.filter(status='active')),
+                             (ROSTER_TAG,))
+
+def _shoe_sizes(queryset):
+    sizes = queryset.order_by().values_list('shoe_size', flat=True).distinct()
+    def numeric_first(size):
+        try:
+            return (0, float(size), size)
+        except ValueError:
+            return (1, 0, size)
+    return sorted(sizes, key=numeric_first)
 
 # Model detail alias
 def model_detail(request, pk):
@@ -60,39 +140,76 @@ def book_model(request, pk):
         start_date = request.POST.get('start_date')
         location = request.POST.get('location')
         budget = request.POST.get('budget')
+        idempotency_key = request.POST.get('idempotency_key', '')[:64] or None
+        success_message = f'Your booking request for {model.name} has been submitted successfully!'
         
         try:
-            client, created = Client.objects.get_or_create(
-                email=client_email,
-                defaults={
-                    'name': client_name,
-                    'client_type': 'individual',
-                    'contact_person': client_name,
-                    'phone': client_phone or '',
-                    'address': location,
-                }
-            )
-            
-            start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            end_datetime = start_datetime
-            
-            Booking.objects.create(
-                model=model,
-                client=client,
-                booking_type=booking_type,
-                title=title,
-                description=description,
-                start_date=start_datetime,
-                end_date=end_datetime,
-                location=location,
-                rate=float(budget) if budget else 0.00,
-                status='pending',
-                phone_number=client_phone,
-                email=client_email,
-                notes=f"Booking created via website by {client_name}"
-            )
+            if idempotency_key and Booking.objects.filter(idempotency_key=idempotency_key).exists():
+                # A double click or retry of a submission that already went through
+                messages.success(request, success_message)
+                return redirect('model-view', pk=model.pk)
+
+            start_datetime = _parse_datetime(start_date)
+            end_date = request.POST.get('end_date')
+            end_datetime = _parse_datetime(end_date) if end_date else None
+            start_datetime, end_datetime = booking_window(start_datetime, end_datetime)
+
+            with transaction.atomic():
+                # Serialise bookings for this model so two requests can't both pass the check.
+                # SQLite ignores FOR UPDATE; there the IMMEDIATE transaction mode (see
+                # settings) already holds the database write lock from the start of the block.
+                Model.objects.select_for_update().filter(pk=model.pk).exists()
+                conflicts = find_conflicts(model.pk, start_datetime, end_datetime)
+                if any(booking.status == 'confirmed' for booking in conflicts):
+                    slots = availability_cache.get(model.pk).free_slots(
+                        max(start_datetime, timezone.now()), end_datetime - start_datetime, count=3,
+                    )
+                    messages.error(
+                        request,
+                        f'{model.name} is already booked at that time. Next available: '
+                        + ', '.join(timezone.localtime(slot_start).strftime('%b %d, %H:%M') for slot_start, _ in slots)
+                    )
+                    return redirect('model-view', pk=model.pk)
+
+                # Only a request that is actually accepted records the client
+                client_id, _ = Client.upsert(
+                    client_email,
+                    name=client_name,
+                    client_type='individual',
+                    contact_person=client_name,
+                    phone=client_phone or '',
+                    address=location,
+                )
+
+                notes = f"Booking created via website by {client_name}"
+                if conflicts:
+                    # Overlapping requests that are still pending are accepted but flagged for staff
+                    notes += "\nOverlaps pending booking(s): " + ', '.join(f"#{booking.pk}" for booking in conflicts)
+
+                try:
+                    with transaction.atomic():
+                        Booking.objects.create(
+                            model=model,
+                            client_id=client_id,
+                            booking_type=booking_type,
+                            title=title,
+                            description=description,
+                            start_date=start_datetime,
+                            end_date=end_datetime,
+                            location=location,
+                            rate=float(budget) if budget else 0.00,
+                            status='pending',
+                            phone_number=client_phone,
+                            email=client_email,
+                            notes=notes,
+                            idempotency_key=idempotency_key,
+                        )
+                except IntegrityError:
+                    # A concurrent retry with the same key won the race
+                    if not idempotency_key or not Booking.objects.filter(idempotency_key=idempotency_key).exists():
+                        raise
             
-            messages.success(request, f'Your booking request for {model.name} has been submitted successfully!')
+            messages.success(request, success_message)
             return redirect('model-view', pk=model.pk)
         
         except Exception as e:
@@ -101,10 +218,140 @@ def book_model(request, pk):
     
     return redirect('model-view', pk=model.pk)
 
+def _parse_datetime(value):
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+# Model availability (JSON)
+def model_availability(request, pk):
+    model = get_object_or_404(Model, pk=pk)
+    try:
+        start = _parse_datetime(request.GET['start'])
+        end = _parse_datetime(request.GET['end']) if request.GET.get('end') else None
+    except (KeyError, ValueError):
+        return JsonResponse({'error': "Pass 'start' (and optionally 'end') as ISO 8601 datetimes."}, status=400)
+    start, end = booking_window(start, end)
+    availability = availability_cache.get(model.pk)
+    return JsonResponse({
+        'model': model.pk,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'free': availability.is_free(start, end),
+        'next_free_slots': [
+            {'start': slot_start.isoformat(), 'end': slot_end.isoformat() if slot_end else None}
+            for slot_start, slot_end in availability.free_slots(start, end - start)
+        ],
+    })
+
+# Model booking calendar (iCalendar subscription feed)
+def model_calendar(request, pk):
+    if not ical.valid_token(pk, request.GET.get('token', '')):
+        raise Http404("Calendar not found")
+    try:
+        feed = ical.model_feed(pk)
+    except Model.DoesNotExist:
+        raise Http404("Calendar not found")
+
+    response = get_conditional_response(request, etag=feed['etag'], last_modified=feed['last_modified'])
+    if response is None:
+        response = HttpResponse(feed['body'], content_type='text/calendar; charset=utf-8')
+    response['ETag'] = feed['etag']
+    response['Last-Modified'] = http_date(feed['last_modified'])
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+# Models free in a date window (JSON)
+def available_models(request):
+    try:
+        start = _parse_datetime(request.GET['start'])
+        end = _parse_datetime(request.GET['end'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': "Pass 'start' and 'end' as ISO 8601 datetimes."}, status=400)
+    if end <= start:
+        return JsonResponse({'error': "'end' must be after 'start'."}, status=400)
+
+    form = ModelDirectoryFilterForm(request.GET, shoe_sizes=_roster_shoe_sizes())
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    models = free_models(form.filter(Model.objects.filter(status='active')), start, end).order_by('name')
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'models': [
+            {
+                'id': pk,
+                'name': name,
+                'gender': gender,
+                'height': float(height),
+                'chest_bust_size': float(chest_bust_size),
+                'waist': float(waist),
+                'hips': float(hips),
+                'shoe_size': shoe_size,
+                'url': reverse('model-view', args=[pk]),
+            }
+            for pk, name, gender, height, chest_bust_size, waist, hips, shoe_size in models.values_list(
+                'id', 'name', 'gender', 'height', 'chest_bust_size', 'waist', 'hips', 'shoe_size',
+            )
+        ],
+    })
+
+# Casting search views
+def casting_search(request):
+    form, results = _casting_results(request)
+    return render(request, 'casting.html', {'form': form, 'results': results})
+
+def casting_search_json(request):
+    form, results = _casting_results(request)
+    if form.is_bound and not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    return JsonResponse({'results': [
+        {
+            'id': model.pk,
+            'name': model.name,
+            'distance': round(model.distance, 3),
+            'gender': model.gender,
+            'height': float(model.height),
+            'chest_bust_size': float(model.chest_bust_size),
+            'waist': float(model.waist),
+            'hips': float(model.hips),
+            'shoe_size': model.shoe_size,
+            'url': model.get_absolute_url(),
+        }
+        for model in results
+    ]})
+
+def _casting_results(request):
+    form = CastingSearchForm(request.GET or None)
+    if not form.is_valid() or not form.target():
+        return form, []
+    nearest = casting_index.nearest(
+        form.target(), k=form.cleaned_data['k'] or 12, gender=form.cleaned_data['gender'] or None,
+    )
+    models = Model.objects.filter(status='active').only(*MODEL_CARD_FIELDS, 'hips', 'shoe_size').in_bulk(
+        [pk for pk, _ in nearest]
+    )
+    results = []
+    for pk, distance in nearest:
+        # Skip rows deleted or deactivated since the index was loaded
+        if pk in models:
+            models[pk].distance = distance
+            results.append(models[pk])
+    return form, results
+
 # Model application view
+@csrf_exempt
 def model_application_view(request):
+    # Upload handlers must be swapped before CSRF checks read request.POST
+    request.upload_handlers = [ApplicantPhotoUploadHandler(request)]
+    return _model_application_view(request)
+
+
+@csrf_protect
+def _model_application_view(request):
     if request.method == 'POST':
-        form = ModelApplicationForm(request.POST, request.FILES)
+        form = ModelApplicationForm(request.POST, request.FILES, upload_errors=request.upload_errors)
         if form.is_valid():
             form.save()
             return redirect('thank_you')
@@ -114,23 +361,47 @@ def model_application_view(request):
 
 # Blog list view with search
 def blog_list(request):
-    blogs = Blog.objects.filter(status=1).order_by('-created_on')
-    search_query = request.GET.get('search')
+    return render(request, 'blog_list.html', _blog_page(request))
+
+# "Load more" fragment for the blog list
+def blog_list_more(request):
+    return render(request, 'partials/blog_cards.html', _blog_page(request))
+
+def _blog_page(request):
+    blogs = Blog.objects.filter(status=1).select_related('author')
+    ordering = ['-created_on', '-id']
+    search_query = request.GET.get('search', '').strip()
     if search_query:
-        blogs = blogs.filter(
-            Q(title__icontains=search_query) | 
-            Q(content__icontains=search_query) |
-            Q(summary__icontains=search_query)
-        )
-    return render(request, 'blog_list.html', {'blogs': blogs})
+        blogs = search.search(blogs, search_query)
+        ordering = ['rank', 'id']
+    try:
+        page, next_cursor = keyset_page(blogs, ordering, request.GET.get('after'), BLOG_PAGE_SIZE)
+    except InvalidCursor:
+        raise Http404("Invalid page")
+    if search_query:
+        for blog in page:
+            blog.snippet = search.highlight(blog.snippet)
+    return {'blogs': page, 'next_cursor': next_cursor, 'search_query': search_query}
 
 # Blog detail view
 def blog_detail(request, slug):
+    version, last_modified = blog_post_version(slug)
+    # A revalidated copy is still a view
+    blog_views.hit(slug)
+    return conditional_render(
+        request, 'blog_detail.html', version, last_modified, lambda: _blog_detail(request, slug),
+    )
+
+def _blog_detail(request, slug):
     blog = get_object_or_404(Blog, slug=slug, status=1)
-    blog.views += 1
-    blog.save(update_fields=['views'])
+    if blog.content and not blog.rendered_content:
+        # Saved before bodies were pre-rendered and not yet backfilled by render_blogs
+        blog.render_content()
+        Blog.objects.filter(pk=blog.pk).update(rendered_content=blog.rendered_content, reading_time=blog.reading_time)
+    # Include hits that have not been flushed yet
+    blog.views += blog_views.pending(blog.slug)
 
-    recent_posts = Blog.objects.filter(status=1).exclude(id=blog.id).order_by('-created_on')[:3]
+    recent_posts = Blog.objects.filter(status=1).exclude(id=blog.id).order_by('-created_on')[:RECENT_POSTS_LIMIT]
     
     context = {
         'blog': blog,
@@ -138,24 +409,24 @@ def blog_detail(request, slug):
     }
     return render(request, 'blog_detail.html', context)
 
-# Static pages views
+# Static pages views (output only changes between deploys)
 def nta(request):
-    return render(request, 'nta.html')
+    return render_cached(request, 'nta.html')
 
 def ntaessence(request):
-    return render(request, 'ntaessence.html')
+    return render_cached(request, 'ntaessence.html')
 
 def ntavision(request):
-    return render(request, 'ntavision.html')
+    return render_cached(request, 'ntavision.html')
 
 def ntacouture(request):
-    return render(request, 'ntacouture.html')
+    return render_cached(request, 'ntacouture.html')
 
 def ntaconnect(request):
-    return render(request, 'ntaconnect.html')
+    return render_cached(request, 'ntaconnect.html')
 
 def about(request):
-    return render(request, 'about.html')
+    return render_cached(request, 'about.html')
 
 # Contact view
 def contact(request):
@@ -200,3 +471,21 @@ def course_registration(request):
     else:
         form = CourseRegistrationForm()
     return render(request, 'registercourse.html', {'form': form})
+
+# On-demand resized media view
+def resized_media(request, width, height, path):
+    ext = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpg'
+    try:
+        image, content_type = get_resized(path, width, height, ext)
+    except ResizeError:
+        raise Http404("Image not available at this size")
+
+    response = FileResponse(image, content_type=content_type)
+    patch_cache_control(response, public=True, max_age=86400)
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+# Media files (uploads, derivatives)
+def media_file(request, path):
+    return serve(request, path)